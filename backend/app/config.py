@@ -1,6 +1,6 @@
 import os
 import re
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
 # Flags - Default values
@@ -9,15 +9,74 @@ class Config:
     START: int = 0
     NUM_LECS: int = 100
     MODEL: str = "gpt-4o-mini"
+    SHARE_LECTURE_MODEL: bool = False
     GET_TRANSCRIPTS: bool = True
     GET_KEY_POINTS: bool = True
     GET_Q_AND_A: bool = True
     TRY_REUSE_NOTES: bool = False
     IS_BOOK: bool = False
+    EXTRACT_WORKERS: int = 1
+    MERGE_WORKERS: int = 4
+    MERGE_CACHE_MB: int = 512
+    MERGE_OUTPUT_PROFILE: str = "fast"
+    PIPELINE_DIRECT: bool = False
+    UPLOAD_MEMORY_LIMIT_MB: int = 64
+    SPOOL_MAX_MB: int = 2048
+    UPLOAD_TTL_HOURS: float = 24
+    PAGE_CACHE_MB: int = 256
+    COLLAPSE_BUILDS: bool = False
+    STRIP_BOILERPLATE: bool = False
+    BOILERPLATE_MIN_FRACTION: float = 0.5
+    LOW_MEMORY: bool = False
+    MUPDF_STORE_MB: int = 64
+    DEDUP_THRESHOLD: float = 1.0
+    DEDUP_SCOPE: str = "chapter"
+    OPENAI_RPM: int = 0
+    OPENAI_TPM: int = 0
+    OPENAI_MODEL_LIMITS: str = ""
+    LLM_CACHE_MB: int = 256
+    LLM_CACHE_TTL_DAYS: float = 30
 
 # Global config instance
 config = Config()
 
+def parse_model_limits(value: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Per-model (rpm, tpm) from OPENAI_MODEL_LIMITS, e.g. "gpt-4o=500:30000,gpt-4o-mini=500:200000".
+    
+    Raises:
+        ValueError: If an entry is not "model=rpm:tpm" with non-negative integers
+    """
+    limits = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        name, _, model_limits = entry.partition("=")
+        rpm, _, tpm = model_limits.partition(":")
+        try:
+            rpm, tpm = int(rpm), int(tpm)
+        except ValueError:
+            rpm = tpm = -1
+        if not name.strip() or rpm < 0 or tpm < 0:
+            raise ValueError(f"Invalid OPENAI_MODEL_LIMITS entry '{entry.strip()}', expected model=rpm:tpm")
+        limits[name.strip()] = (rpm, tpm)
+    return limits
+
+def apply_env_overrides():
+    """Take per-deployment rate limits from the environment when set, ignoring malformed values"""
+    for name in ("OPENAI_RPM", "OPENAI_TPM"):
+        if os.getenv(name):
+            try:
+                setattr(config, name, int(os.environ[name]))
+            except ValueError:
+                print(f"Ignoring {name}={os.environ[name]!r}: not an integer")
+    if os.getenv("OPENAI_MODEL_LIMITS"):
+        try:
+            parse_model_limits(os.environ["OPENAI_MODEL_LIMITS"])
+            config.OPENAI_MODEL_LIMITS = os.environ["OPENAI_MODEL_LIMITS"]
+        except ValueError as e:
+            print(f"Ignoring OPENAI_MODEL_LIMITS: {e}")
+
 def remove_unwanted_lines(text: str) -> str:
     """Remove unwanted lines from text"""
     # If chatgpt starts with a conversational message, Remove first and last line
@@ -147,8 +206,8 @@ model_costs = {
     "gpt-o4-mini":   [1.10, 0.28, 4.40],
 }
 
-def model_usage(usage, model: str) -> float:
-    """Calculate model usage cost"""
+def usage_tokens(usage) -> Dict[str, int]:
+    """Prompt, cached prompt and completion token counts of a completion's usage"""
     token_fields = ['prompt_tokens', 'cached_tokens', 'completion_tokens']
 
     # Extract token usage from nested and direct attributes
@@ -158,7 +217,15 @@ def model_usage(usage, model: str) -> float:
         if key in token_fields and not hasattr(val, '__dict__') and val})
 
     # Reorder according to token_fields
-    token_usage = {key: flat_usage.get(key, 0) for key in token_fields}
+    return {key: flat_usage.get(key, 0) for key in token_fields}
+
+def cached_ratio(prompt_tokens: int, cached_tokens: int) -> float:
+    """Share of prompt tokens served from the provider's prompt cache"""
+    return cached_tokens / prompt_tokens if prompt_tokens else 0.0
+
+def model_usage(usage, model: str) -> float:
+    """Calculate model usage cost"""
+    token_usage = usage_tokens(usage)
 
     cost = 0
     if model in model_costs:
@@ -177,6 +244,10 @@ def model_usage(usage, model: str) -> float:
 
     return cost
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text, at about 4 characters per token"""
+    return (len(text) + 3) // 4
+
 def extract_sections(md_text: str) -> Dict[str, str]:
     """Extract sections from markdown text"""
     sections = {}
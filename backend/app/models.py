@@ -1,21 +1,52 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Any, Dict
+from typing import List, Literal, Optional, Any, Dict
 
 class ConfigUpdate(BaseModel):
     START: Optional[int] = Field(None, description="Starting lecture index")
     NUM_LECS: Optional[int] = Field(None, description="Number of lectures to process")
     MODEL: Optional[str] = Field(None, description="OpenAI model to use")
+    SHARE_LECTURE_MODEL: Optional[bool] = Field(None, description="Generate study notes and key points with MODEL too, so every call of a lecture shares one prompt cache")
     GET_TRANSCRIPTS: Optional[bool] = Field(None, description="Generate transcripts")
     GET_KEY_POINTS: Optional[bool] = Field(None, description="Generate key points")
     GET_Q_AND_A: Optional[bool] = Field(None, description="Generate questions and answers")
     TRY_REUSE_NOTES: Optional[bool] = Field(None, description="Try to reuse existing notes")
     IS_BOOK: Optional[bool] = Field(None, description="Content is from a book rather than lectures")
+    EXTRACT_WORKERS: Optional[int] = Field(None, description="Worker processes for page extraction (1 = serial)")
+    MERGE_WORKERS: Optional[int] = Field(None, description="Worker processes (spooled uploads) and threads (in-memory uploads) that validate uploads before merging (1 = serial)")
+    MERGE_CACHE_MB: Optional[int] = Field(None, description="Disk quota of the merged PDF cache in MB (0 = disabled)")
+    MERGE_OUTPUT_PROFILE: Optional[Literal["fast", "balanced", "compact"]] = Field(None, description="How merged PDFs are saved: 'fast', 'balanced' or 'compact'")
+    PIPELINE_DIRECT: Optional[bool] = Field(None, description="Complete pipeline extracts each uploaded PDF as one lecture instead of merging first")
+    UPLOAD_MEMORY_LIMIT_MB: Optional[int] = Field(None, description="Upload content one request may hold in memory in MB; the rest is spooled to disk")
+    SPOOL_MAX_MB: Optional[int] = Field(None, description="Disk quota of the upload spool in MB")
+    UPLOAD_TTL_HOURS: Optional[float] = Field(None, description="Hours an unfinished resumable upload is kept after its last chunk, and a finalized one after finalizing (0 = forever)")
+    PAGE_CACHE_MB: Optional[int] = Field(None, description="Size limit of the on-disk page text cache in MB (0 = disabled)")
+    COLLAPSE_BUILDS: Optional[bool] = Field(None, description="Keep only the final page of animation build-up sequences")
+    STRIP_BOILERPLATE: Optional[bool] = Field(None, description="Remove header/footer lines repeated across the deck")
+    BOILERPLATE_MIN_FRACTION: Optional[float] = Field(None, description="Fraction of pages a line must appear on to count as boilerplate")
+    LOW_MEMORY: Optional[bool] = Field(None, description="Extract serially with a capped MuPDF store and report peak memory")
+    MUPDF_STORE_MB: Optional[int] = Field(None, description="MuPDF resource store size in MB that triggers a flush in low-memory mode")
+    DEDUP_THRESHOLD: Optional[float] = Field(None, description="Word-shingle Jaccard similarity at which a page counts as a duplicate (1.0 = exact repeats of the previous page only)")
+    DEDUP_SCOPE: Optional[Literal["chapter", "deck"]] = Field(None, description="Where near-duplicate pages are looked up: 'chapter' or 'deck'")
+    OPENAI_RPM: Optional[int] = Field(None, description="Requests per minute allowed per model (0 = unlimited)")
+    OPENAI_TPM: Optional[int] = Field(None, description="Estimated tokens per minute allowed per model (0 = unlimited)")
+    OPENAI_MODEL_LIMITS: Optional[str] = Field(None, description="Per-model overrides as 'model=rpm:tpm' pairs separated by commas")
+    LLM_CACHE_MB: Optional[int] = Field(None, description="Size limit of the on-disk OpenAI response cache in MB (0 = disabled)")
+    LLM_CACHE_TTL_DAYS: Optional[float] = Field(None, description="Days a cached response stays valid (0 = until evicted for size)")
 
 class LectureData(BaseModel):
     index: int
     title: str
     content: str
 
+class CallUsage(BaseModel):
+    step: Optional[str] = None
+    model: str
+    prompt_tokens: int
+    cached_tokens: int
+    completion_tokens: int
+    cached_token_ratio: float
+    response_cached: bool = False
+
 class ProcessedLecture(BaseModel):
     index: int
     title: str
@@ -25,11 +56,17 @@ class ProcessedLecture(BaseModel):
     answers: Optional[str] = None
     key_points: Optional[str] = None
     cost: float
+    model: Optional[str] = None
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    cached_token_ratio: float = 0.0
+    calls: List[CallUsage] = []
 
 class MergeResponse(BaseModel):
     message: str
     page_count: int
     bookmark_count: int
+    cached: bool = False
 
 class ExtractionResponse(BaseModel):
     message: str
@@ -41,6 +78,28 @@ class ProcessingResponse(BaseModel):
     total_cost: float
     processed_count: int
     results: List[ProcessedLecture]
+    cache_hits: int = 0
+    cache_misses: int = 0
+    cache_hit_rate: float = 0.0
+    cached_cost: float = 0.0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    cached_token_ratio: float = 0.0
+
+class UploadCreate(BaseModel):
+    filename: str = Field(..., description="Name of the PDF being uploaded")
+    size: Optional[int] = Field(None, description="Total size in bytes, if known")
+
+class UploadFinalize(BaseModel):
+    sha256: Optional[str] = Field(None, description="Expected sha256 of the whole file")
+
+class UploadStatus(BaseModel):
+    upload_id: str
+    filename: str
+    size: Optional[int] = None
+    offset: int
+    finalized: bool
+    sha256: Optional[str] = None
 
 class StatusResponse(BaseModel):
     status: str
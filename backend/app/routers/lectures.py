@@ -1,22 +1,32 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from fastapi.responses import FileResponse
-from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Form, HTTPException, Depends
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Iterator, List, Optional, Tuple
+from dataclasses import asdict
+import json
 import os
+import sys
 from dotenv import load_dotenv
 
-from ..services.pdf_merger import merge_pdfs
-from ..services.content_extractor import extract_content_from_pdf
+from ..services.pdf_merger import MERGED_PDF_FILENAME, merge_pdfs, save_merged_pdf
+from ..services.content_extractor import (
+    Lectures, config_index_range, extract_content_from_files, extract_content_from_pdf, iter_lectures
+)
 from ..services.openai_service import OpenAIService
+from ..services.upload_sessions import resolve_uploads
 from ..models import (
     MergeResponse, ExtractionResponse, ProcessingResponse, 
     ConfigUpdate, StatusResponse
 )
-from ..config import config
-from ..utils.temp_utils import create_temp_file, get_temp_file_path, list_temp_files
+from ..config import apply_env_overrides, config, parse_model_limits
+from ..utils.temp_utils import SavedJsonItems, get_temp_file_path, list_temp_files
 from ..utils.output_utils import get_output_file_path, list_output_files
+from ..utils.pdf_utils import PdfSource
+from ..utils.upload_spool import CHUNK_SIZE, UploadSpool
 
 # Load environment variables
 load_dotenv()
+apply_env_overrides()
 
 router = APIRouter()
 
@@ -27,98 +37,190 @@ def get_openai_service():
         raise HTTPException(status_code=500, detail="OpenAI API key not configured")
     return OpenAIService(openai_key)
 
-@router.post("/merge-pdfs", response_model=MergeResponse)
-async def merge_pdf_files(files: List[UploadFile] = File(...)):
+def request_upload_spool() -> Iterator[UploadSpool]:
     """
-    Merge multiple PDF files into a single PDF with bookmarks.
+    Spool for the uploads of one request, under the configured memory ceiling.
+    Its spooled files stay pinned until the response, streamed or not, is sent.
     """
-    if not files:
-        raise HTTPException(status_code=400, detail="No files provided")
-    
-    # Validate file types
-    pdf_files = []
+    spool = UploadSpool(config.UPLOAD_MEMORY_LIMIT_MB * 1024 * 1024, config.SPOOL_MAX_MB)
+    try:
+        yield spool
+    finally:
+        spool.release()
+
+async def read_pdf_inputs(spool: UploadSpool, files: Optional[List[UploadFile]],
+                          upload_ids: Optional[str]) -> List[Tuple[str, PdfSource]]:
+    """
+    (filename, content) pairs for multipart files and comma-separated IDs of
+    finalized resumable uploads. Upload IDs come first, in the given order.
+    """
+    files = files or []
     for file in files:
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail=f"File {file.filename} is not a PDF")
-        
-        content = await file.read()
+    
+    ids = [upload_id.strip() for upload_id in (upload_ids or "").split(",") if upload_id.strip()]
+    pdf_files = resolve_uploads(ids, spool)
+    
+    for file in files:
+        content = await spool.add(file)
         pdf_files.append((file.filename, content))
     
+    if not pdf_files:
+        raise HTTPException(status_code=400, detail="No files provided")
+    return pdf_files
+
+async def read_pdf_input(spool: UploadSpool, file: Optional[UploadFile], upload_id: Optional[str]) -> PdfSource:
+    """Content of a single multipart file or finalized resumable upload"""
+    if file is not None and upload_id:
+        raise HTTPException(status_code=400, detail="Send either a file or an upload_id, not both")
+    if file is None and not upload_id:
+        raise HTTPException(status_code=400, detail="No file provided")
+    if file is not None and not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+    
+    (_, content), = await read_pdf_inputs(spool, [file] if file is not None else None, upload_id)
+    return content
+
+def lecture_index_range(start: Optional[int], num_lecs: Optional[int]) -> Optional[Tuple[int, int]]:
+    """Index range selected by optional start/num_lecs form fields, or None for every lecture"""
+    if start is None and num_lecs is None:
+        return None
+    start = start or 0
+    return start, (start + num_lecs if num_lecs is not None else sys.maxsize)
+
+def extraction_response(message: str, lectures: Lectures):
+    """
+    ExtractionResponse for extracted lectures. Lectures saved to disk in
+    LOW_MEMORY mode are streamed from their file into the same JSON body,
+    then the file is deleted.
+    """
+    if not isinstance(lectures, SavedJsonItems):
+        return ExtractionResponse(message=message, lecture_count=len(lectures), lectures=lectures)
+    
+    def body():
+        try:
+            yield json.dumps({"message": message, "lecture_count": len(lectures)})[:-1].encode("utf-8")
+            yield b', "lectures": '
+            with open(lectures.path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    yield chunk
+            yield b"}"
+        finally:
+            lectures.delete()
+    
+    return StreamingResponse(body(), media_type="application/json")
+
+def delete_saved_lectures(lectures: Optional[Lectures]) -> None:
+    """Remove the file behind lectures read back from disk, if any"""
+    if isinstance(lectures, SavedJsonItems):
+        lectures.delete()
+
+@router.post("/merge-pdfs", response_model=MergeResponse)
+async def merge_pdf_files(
+    files: Optional[List[UploadFile]] = File(None),
+    upload_ids: Optional[str] = Form(None, description="Comma-separated IDs of finalized resumable uploads"),
+    spool: UploadSpool = Depends(request_upload_spool)
+):
+    """
+    Merge multiple PDF files into a single PDF with bookmarks.
+    """
+    # Validate file types
+    pdf_files = await read_pdf_inputs(spool, files, upload_ids)
+    
     try:
-        merged_pdf_bytes = await merge_pdfs(pdf_files)
-        
-        # Count pages and bookmarks (simplified estimation)
-        import fitz
-        
-        temp_file_path = create_temp_file(suffix='.pdf', content=merged_pdf_bytes)
+        merged = await merge_pdfs(pdf_files)
         try:
-            doc = fitz.open(str(temp_file_path))
-            page_count = doc.page_count
-            bookmark_count = len(doc.get_toc())
-            doc.close()
+            # Later requests (possibly on another worker) read it from temp/
+            merged.save()
         finally:
-            # Clean up temporary file
-            try:
-                temp_file_path.unlink()
-            except Exception:
-                pass
-        
-        # In a real application, you might want to save this to storage
-        # For now, we'll just return the response
+            merged.close()
         
         return MergeResponse(
             message="PDFs merged successfully",
-            page_count=page_count,
-            bookmark_count=bookmark_count
+            page_count=merged.page_count,
+            bookmark_count=len(merged.toc),
+            cached=merged.cached
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error merging PDFs: {str(e)}")
 
 @router.post("/extract-content", response_model=ExtractionResponse)
-async def extract_pdf_content(file: UploadFile = File(...)):
+async def extract_pdf_content(
+    file: Optional[UploadFile] = File(None),
+    upload_id: Optional[str] = Form(None, description="ID of a finalized resumable upload, instead of file"),
+    start: Optional[int] = Form(None, description="First lecture index to extract"),
+    num_lecs: Optional[int] = Form(None, description="Number of lectures to extract"),
+    spool: UploadSpool = Depends(request_upload_spool)
+):
     """
     Extract content from a merged PDF file and structure it by lectures.
+    Only the pages of the lectures selected by start/num_lecs are read.
     """
-    if not file.filename.lower().endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="File must be a PDF")
+    pdf_content = await read_pdf_input(spool, file, upload_id)
     
     try:
-        pdf_content = await file.read()
-        lectures = await extract_content_from_pdf(pdf_content)
+        lectures = await extract_content_from_pdf(pdf_content, lecture_index_range(start, num_lecs))
         
-        return ExtractionResponse(
-            message="Content extracted successfully",
-            lecture_count=len(lectures),
-            lectures=lectures
-        )
+        return extraction_response("Content extracted successfully", lectures)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error extracting content: {str(e)}")
 
+@router.post("/extract-content-stream")
+async def extract_pdf_content_stream(
+    file: Optional[UploadFile] = File(None),
+    upload_id: Optional[str] = Form(None, description="ID of a finalized resumable upload, instead of file"),
+    start: Optional[int] = Form(None, description="First lecture index to extract"),
+    num_lecs: Optional[int] = Form(None, description="Number of lectures to extract"),
+    spool: UploadSpool = Depends(request_upload_spool)
+):
+    """
+    Extract content like /extract-content, streaming one lecture per line (NDJSON)
+    as soon as each chapter is finished.
+    """
+    pdf_content = await read_pdf_input(spool, file, upload_id)
+    lectures = iter_lectures(pdf_content, lecture_index_range(start, num_lecs))
+    
+    # Build the first chapter before responding so a missing TOC or unreadable
+    # PDF is still reported with a proper status code
+    try:
+        first_lecture = await run_in_threadpool(next, lectures, None)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error extracting content: {str(e)}")
+    
+    def ndjson_lines():
+        if first_lecture is None:
+            return
+        yield json.dumps(first_lecture, ensure_ascii=False) + "\n"
+        for lecture in lectures:
+            yield json.dumps(lecture, ensure_ascii=False) + "\n"
+    
+    # Starlette iterates sync generators in its threadpool, off the event loop
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 @router.post("/extract-content-from-merged", response_model=ExtractionResponse)
-async def extract_content_from_merged_pdf():
+async def extract_content_from_merged_pdf(
+    start: Optional[int] = Form(None, description="First lecture index to extract"),
+    num_lecs: Optional[int] = Form(None, description="Number of lectures to extract")
+):
     """
     Extract content from the merged PDF file stored in temp directory.
     """
     try:
         # Look for merged PDF in temp directory
-        merged_pdf_path = get_temp_file_path("merged_lectures.pdf")
+        merged_pdf_path = get_temp_file_path(MERGED_PDF_FILENAME)
         
         if not merged_pdf_path.exists():
             raise HTTPException(status_code=404, detail="No merged PDF found. Please merge PDFs first.")
         
-        # Read the merged PDF
-        with open(merged_pdf_path, 'rb') as f:
-            pdf_content = f.read()
+        # Read the stored file in place rather than copying it through memory
+        lectures = await extract_content_from_pdf(merged_pdf_path, lecture_index_range(start, num_lecs))
         
-        lectures = await extract_content_from_pdf(pdf_content)
-        
-        return ExtractionResponse(
-            message="Content extracted successfully from merged PDF",
-            lecture_count=len(lectures),
-            lectures=lectures
-        )
+        return extraction_response("Content extracted successfully from merged PDF", lectures)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error extracting content from merged PDF: {str(e)}")
@@ -127,13 +229,13 @@ async def extract_content_from_merged_pdf():
 async def process_lectures_with_ai(
     lectures_json: str = Form(...),
     max_concurrent: int = Form(3, description="Maximum concurrent API calls"),
+    use_cache: bool = Form(True, description="Reuse cached responses for identical requests"),
     openai_service: OpenAIService = Depends(get_openai_service)
 ):
     """
     Process lectures using OpenAI API to generate study materials.
     """
     try:
-        import json
         lectures = json.loads(lectures_json)
         
         if not isinstance(lectures, list):
@@ -144,13 +246,16 @@ async def process_lectures_with_ai(
             if not all(key in lecture for key in ['index', 'title', 'content']):
                 raise HTTPException(status_code=400, detail="Each lecture must have 'index', 'title', and 'content'")
         
+        openai_service.use_cache = use_cache
         results = await openai_service.process_multiple_lectures(lectures, max_concurrent)
         
         return ProcessingResponse(
             message="Lectures processed successfully",
             total_cost=openai_service.total_cost,
             processed_count=len(results),
-            results=results
+            results=results,
+            **openai_service.cache_stats(),
+            **openai_service.usage_stats()
         )
         
     except json.JSONDecodeError:
@@ -160,79 +265,96 @@ async def process_lectures_with_ai(
 
 @router.post("/process-complete-pipeline")
 async def process_complete_pipeline(
-    files: List[UploadFile] = File(...),
+    background_tasks: BackgroundTasks,
+    files: Optional[List[UploadFile]] = File(None),
+    upload_ids: Optional[str] = Form(None, description="Comma-separated IDs of finalized resumable uploads"),
     max_concurrent: int = Form(3, description="Maximum concurrent API calls"),
-    openai_service: OpenAIService = Depends(get_openai_service)
+    use_cache: bool = Form(True, description="Reuse cached responses for identical requests"),
+    openai_service: OpenAIService = Depends(get_openai_service),
+    spool: UploadSpool = Depends(request_upload_spool)
 ):
     """
     Complete pipeline: merge PDFs → extract content → process with AI
+    
+    With PIPELINE_DIRECT, each uploaded PDF is extracted as one lecture and the
+    merged PDF is only assembled after the response is sent, to be saved for
+    download.
     """
+    lectures = None
+    merged = None
     try:
         # Step 1: Merge PDFs
-        pdf_files = []
-        for file in files:
-            if not file.filename.lower().endswith('.pdf'):
-                raise HTTPException(status_code=400, detail=f"File {file.filename} is not a PDF")
-            content = await file.read()
-            pdf_files.append((file.filename, content))
+        pdf_files = await read_pdf_inputs(spool, files, upload_ids)
         
-        merged_pdf_bytes = await merge_pdfs(pdf_files)
-        
-        # Step 2: Extract content
-        lectures = await extract_content_from_pdf(merged_pdf_bytes)
+        if config.PIPELINE_DIRECT:
+            # Steps 1 and 2: one lecture per file, no merged TOC to round-trip
+            lectures, merged = await extract_content_from_files(pdf_files, config_index_range())
+        else:
+            merged = await merge_pdfs(pdf_files)
+            try:
+                # Step 2: Extract content, only for the lectures the AI step
+                # will process, straight from the merged document
+                lectures = await extract_content_from_pdf(merged.source, config_index_range())
+                merged.save()
+            finally:
+                merged.close()
+        # Uploaded contents are not needed while the lectures are processed
+        del pdf_files
         
         # Step 3: Process with AI
+        openai_service.use_cache = use_cache
         results = await openai_service.process_multiple_lectures(lectures, max_concurrent)
         
+        if merged is not None:
+            # Saved for download off the request path; the task closes it
+            background_tasks.add_task(save_merged_pdf, merged)
+            merged = None
+        
         return {
             "message": "Complete pipeline executed successfully",
             "total_cost": openai_service.total_cost,
             "processed_count": len(results),
-            "results": results
+            "results": results,
+            **openai_service.cache_stats(),
+            **openai_service.usage_stats()
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Pipeline error: {str(e)}")
+    finally:
+        if merged is not None:
+            merged.close()
+        delete_saved_lectures(lectures)
 
 @router.get("/status", response_model=StatusResponse)
 async def get_status():
     """Get current configuration and status"""
     return StatusResponse(
         status="active",
-        config={
-            "START": config.START,
-            "NUM_LECS": config.NUM_LECS,
-            "MODEL": config.MODEL,
-            "GET_TRANSCRIPTS": config.GET_TRANSCRIPTS,
-            "GET_KEY_POINTS": config.GET_KEY_POINTS,
-            "GET_Q_AND_A": config.GET_Q_AND_A,
-            "TRY_REUSE_NOTES": config.TRY_REUSE_NOTES,
-            "IS_BOOK": config.IS_BOOK
-        }
+        config=asdict(config)
     )
 
 @router.post("/update-config")
 async def update_configuration(config_update: ConfigUpdate):
     """Update configuration settings"""
     updated_fields = []
+    updates = config_update.dict(exclude_unset=True)
+    
+    # Checked up front so a bad value is rejected here, not on every completion
+    if updates.get("OPENAI_MODEL_LIMITS") is not None:
+        try:
+            parse_model_limits(updates["OPENAI_MODEL_LIMITS"])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
-    for field, value in config_update.dict(exclude_unset=True).items():
+    for field, value in updates.items():
         if hasattr(config, field):
             setattr(config, field, value)
             updated_fields.append(field)
     
     return {
         "message": f"Configuration updated: {', '.join(updated_fields)}",
-        "updated_config": {
-            "START": config.START,
-            "NUM_LECS": config.NUM_LECS,
-            "MODEL": config.MODEL,
-            "GET_TRANSCRIPTS": config.GET_TRANSCRIPTS,
-            "GET_KEY_POINTS": config.GET_KEY_POINTS,
-            "GET_Q_AND_A": config.GET_Q_AND_A,
-            "TRY_REUSE_NOTES": config.TRY_REUSE_NOTES,
-            "IS_BOOK": config.IS_BOOK
-        }
+        "updated_config": asdict(config)
     }
 
 @router.get("/temp-files")
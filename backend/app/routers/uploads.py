@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Query, Request
+from typing import Optional
+
+from ..models import UploadCreate, UploadFinalize, UploadStatus
+from ..services.upload_sessions import append_chunk, create_upload, finalize_upload, get_upload
+
+router = APIRouter()
+
+@router.post("/uploads", response_model=UploadStatus)
+async def create_upload_session(upload: UploadCreate):
+    """
+    Start a resumable upload. Send the file with PUT /uploads/{upload_id}
+    in chunks, then finalize it.
+    """
+    return create_upload(upload.filename, upload.size)
+
+@router.put("/uploads/{upload_id}", response_model=UploadStatus)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., description="Byte offset of this chunk; must equal the bytes received so far")
+):
+    """
+    Append the raw request body at offset. After a failed request, read the
+    offset with GET /uploads/{upload_id} and resend from there.
+    """
+    return await append_chunk(upload_id, offset, request.stream())
+
+@router.get("/uploads/{upload_id}", response_model=UploadStatus)
+async def get_upload_status(upload_id: str):
+    """Get the bytes received so far and whether the upload is finalized"""
+    return get_upload(upload_id)
+
+@router.post("/uploads/{upload_id}/finalize", response_model=UploadStatus)
+async def finalize_upload_session(upload_id: str, finalize: Optional[UploadFinalize] = None):
+    """
+    Complete an upload. Its ID can then be passed as upload_ids to
+    /merge-pdfs and /process-complete-pipeline, or as upload_id to
+    /extract-content and /extract-content-stream.
+    """
+    return await finalize_upload(upload_id, finalize.sha256 if finalize else None)
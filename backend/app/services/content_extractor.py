@@ -1,135 +1,28 @@
 import fitz
+import hashlib
 import json
+import os
 import re
+import shutil
+import tempfile
+import uuid
+from bisect import bisect_right
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from difflib import SequenceMatcher
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Hashable, Iterator, Optional, Set, Tuple, Union
 from fastapi import HTTPException
-from ..utils.temp_utils import create_temp_file, save_temp_json
-
-def extract_clean_paragraphs(text: str) -> str:
-    """Extract and clean paragraphs from text"""
-    
-    def filter_lines_with_three_letters(text_block):
-        lines = text_block.splitlines()
-        return "\n".join(line for line in lines if re.search(r'[A-Za-z]{3}', line))
-    
-    filtered_text = filter_lines_with_three_letters(text)
-    lines = filtered_text.split('\n')
-    cleaned_lines = []
-
-    for line in lines:
-        stripped = line.strip()
-        if re.match(r'^\s*\d+\s*$', stripped):
-            continue
-        if not stripped or len(stripped) < 3:
-            continue
-        cleaned_lines.append(stripped)
-
-    paragraph_text = ' '.join(cleaned_lines)
-    paragraph_text = re.sub(r'\s+', ' ', paragraph_text)
-    return paragraph_text.strip()
-
-def insert_period_after_title_match(title: str, content: str, max_scan=None, start_offset=0) -> str:
-    """Insert period after title match in content"""
-    title_letters = [c for c in title.lower() if c.isalpha()]
-    match_length = 0
-    content_letter_index = 0
-    i = start_offset 
-
-    while match_length < len(title_letters) and i < len(content):
-        c = content[i]
-        if c.isalpha():
-            if c.lower() == title_letters[match_length]:
-                match_length += 1
-            else:
-                match_length = 0
-                if title_letters and c.lower() == title_letters[0]:
-                    match_length = 1
-            content_letter_index += 1
-        elif not c.isspace():
-            content_letter_index += 1
-
-        if max_scan is not None and content_letter_index >= max_scan:
-            break
-        i += 1
-
-    if match_length == len(title_letters):
-        if i < len(content) and content[i] != '.':
-            return content[:i] + '.' + content[i:]
-    return content
-
-def remove_capital(text: str, min_length=4) -> str:
-    """Remove capital letter blocks and replace with formatted text"""
-    pattern = re.compile(r"\b(?:(?:[A-Z]|[^\w\s.])+\s?)+\b")
-
-    result = []
-    last_end = 0
-
-    for match in pattern.finditer(text):
-        start, end = match.start(), match.end()
-        block = match.group().strip()
-        words = block.split()
-
-        # Ignore if it's a single character that's a letter (symbols count as part of blocks)
-        if len(words) == 1 and len(words[0]) == 1 and words[0].isalpha():
-            continue
-
-        # Check for trailing single character (letters or symbols except period)
-        has_trailing_single = (len(words) >= 2 and len(words[-1]) == 1 
-                              and words[-1] != '.')
-
-        core_words = words[:-1] if has_trailing_single else words
-        core_block = ' '.join(core_words)
-
-        # Skip blocks that don't meet min length (excluding spaces and non-letter chars)
-        if len(re.sub(r'[^A-Za-z0-9]', '', core_block)) <= min_length:
-            continue
-
-        # Build the replacement block
-        replacement = core_block + '.'
-        if has_trailing_single:
-            replacement += ' ' + words[-1]
-
-        # Check the char after the match
-        char_after = text[end] if end < len(text) else ''
-        if char_after == '.':
-            replacement = replacement.rstrip('.')
-
-        # Add space if needed
-        if end >= len(text) or text[end] not in [' ', '.']:
-            replacement += ' '
-
-        # Append unchanged text + replacement
-        result.append(text[last_end:start])
-        result.append(replacement)
-        last_end = end
-
-    # Append remaining text
-    result.append(text[last_end:])
-    return ''.join(result)
-
-def normalize_text(text: str) -> str:
-    """Normalize text by replacing Unicode characters and cleaning format"""
-    # Replace Unicode punctuation with ASCII equivalents
-    replacements = {
-        ''': "'", ''': "'", '‚': "'", '‛': "'",
-        '—': '-', '–': '-', '−': '-',
-        '…': '...',
-        ' ': ' ', ' ': ' ',
-        '′': "'",
-        '‹': '<', '›': '>',
-    }
-    for uni_char, ascii_char in replacements.items():
-        text = text.replace(uni_char, ascii_char)
-
-    # Remove duplicate periods
-    text = re.sub(r'\.\s+\.', '.', text)
-
-    # Match full all-caps block followed by a capitalized word
-    text = remove_capital(text)
-
-    return text
+from ..config import config, estimate_tokens
+from ..utils.memory_utils import peak_rss_mb, peak_rss_report
+from ..utils.pdf_utils import PdfSource, open_pdf, trim_mupdf_store
+from ..utils.sqlite_cache import SqliteCache
+from ..utils.temp_utils import SavedJsonItems, get_temp_dir, get_temp_file_path, save_temp_json_items
+from .pdf_merger import MergedPdf, bookmark_title_from_filename, defer_merge, validate_pdfs
+from .page_filters import BoilerplateIndex, NearDuplicateIndex, collapse_builds
+from .text_normalizer import (
+    extract_clean_paragraphs, insert_periods_after_titles, join_cleaned_pages, normalize_text
+)
 
 def is_similar_content(prev_content: str, current_content: str, similarity_threshold=1) -> bool:
     """Check if two content strings are similar"""
@@ -153,124 +46,730 @@ def is_similar_content(prev_content: str, current_content: str, similarity_thres
     
     return similarity >= similarity_threshold
 
-def extract_all_toc_entries_with_content(pdf_bytes: bytes) -> List[Dict[str, Any]]:
-    """Extract table of contents entries with content from PDF bytes"""
-    temp_file_path = create_temp_file(suffix='.pdf', prefix='extract_', content=pdf_bytes)
+def assign_sub_headings(toc_flat: List[Dict[str, Any]], toc_entries: List[Dict[str, Any]]) -> List[List[str]]:
+    """
+    Group the titles of level >= 2 TOC entries by the chapter containing their page.
     
-    try:
-        doc = fitz.open(str(temp_file_path))
-        toc = doc.get_toc()
-
-        if not toc:
-            raise HTTPException(status_code=400, detail="No table of contents found in PDF")
-
-        first_title = toc[0][1].strip()
-        ZERO_INDEXED = bool(re.match(r'^0+($|[^0-9])', first_title))
-
-        toc_entries = [
-            {"level": level, "title": title, "start_page": start_page}
-            for level, title, start_page in toc
-            if title.strip() != "Blank Page"
-        ]
-
-        toc_level_1_2 = [e for e in toc_entries if e["level"] in (1, 2)]
-        toc_level_1_2.sort(key=lambda x: x["start_page"])
-
-        seen_pages = set()
-        filtered_toc = []
-        for entry in toc_level_1_2:
-            if entry["start_page"] not in seen_pages:
-                filtered_toc.append(entry)
-                seen_pages.add(entry["start_page"])
-
-        toc_flat = []
-        for new_index, entry in enumerate(filtered_toc):
-            toc_flat.append(OrderedDict([
-                ("index", new_index + 1 * (not ZERO_INDEXED)),
-                ("level", entry["level"]),
-                ("start_page", entry["start_page"]),
-                ("end_page", None),
-                ("title", entry["title"])
-            ]))
-
-        for i in range(len(toc_flat)):
-            current = toc_flat[i]
-            next_start = toc_flat[i + 1]["start_page"] if i + 1 < len(toc_flat) else len(doc) + 1
-            current["end_page"] = next_start - 1
-
-            chapter_text = ""
-            previous_page_content = None
+    toc_flat is sorted by start_page and its page ranges are contiguous, so the
+    start pages form an interval index and a bisect finds the owning chapter.
+    
+    Returns:
+        One list of titles per toc_flat entry, in TOC order
+    """
+    chapter_starts = [entry["start_page"] for entry in toc_flat]
+    sub_headings = [[] for _ in toc_flat]
+
+    for entry in toc_entries:
+        if entry["level"] < 2:
+            continue
+        page = entry["start_page"]
+        position = bisect_right(chapter_starts, page) - 1
+        if position >= 0 and page <= toc_flat[position]["end_page"]:
+            sub_headings[position].append(entry["title"])
+
+    return sub_headings
+
+# PDFs of the extraction pool, and the one each worker currently has open
+# (see _init_page_worker)
+_worker_sources: List[PdfSource] = []
+_worker_doc = None
+_worker_file: Optional[int] = None
+
+# Bump when page cleaning or the page fingerprint changes so cached pages
+# are extracted again
+_PAGE_CACHE_VERSION = b"2"
+_page_cache: Optional[SqliteCache] = None
+
+def _init_page_worker(sources: List[PdfSource]) -> None:
+    """Receive the pool's PDFs once in each worker process of the extraction pool"""
+    global _worker_sources, _worker_doc, _worker_file
+    _worker_sources = sources
+    _worker_doc = None
+    _worker_file = None
+
+def _worker_document(file_num: int) -> fitz.Document:
+    """A worker's open copy of PDF file_num, closing the one it had open before"""
+    global _worker_doc, _worker_file
+    if _worker_file != file_num:
+        if _worker_doc is not None:
+            _worker_doc.close()
+        _worker_doc = open_pdf(_worker_sources[file_num])
+        _worker_file = file_num
+    return _worker_doc
+
+def _read_page(doc: fitz.Document, page_num: int) -> Tuple[str, str]:
+    """Return the raw and cleaned text of a 1-based page number"""
+    page_text = doc.load_page(page_num - 1).get_text()
+    return page_text, extract_clean_paragraphs(page_text)
+
+def _read_page_shard(shard: Tuple[int, List[int]]) -> List[Tuple[str, str]]:
+    """Worker entry point: extract a (file number, page numbers) shard of pages"""
+    file_num, page_nums = shard
+    doc = _worker_document(file_num)
+    return [_read_page(doc, page_num) for page_num in page_nums]
+
+_XREF_REF = re.compile(r"(\d+) 0 R")
+
+def _key_xref(doc: fitz.Document, xref: int, key: str) -> int:
+    """Xref an object's key refers to (the first one for an array), 0 if none"""
+    kind, value = doc.xref_get_key(xref, key)
+    match = _XREF_REF.search(value) if kind in ("xref", "array") else None
+    return int(match.group(1)) if match else 0
+
+def _font_streams(doc: fitz.Document, xref: int) -> Iterator[bytes]:
+    """Raw ToUnicode map and embedded font program of a font, where present"""
+    to_unicode = _key_xref(doc, xref, "ToUnicode")
+    if to_unicode:
+        yield doc.xref_stream_raw(to_unicode) or b""
+    # Type0 fonts keep their glyphs in the descendant CID font
+    descendant = _key_xref(doc, xref, "DescendantFonts")
+    descriptor = _key_xref(doc, descendant or xref, "FontDescriptor")
+    if descriptor:
+        for key in ("FontFile", "FontFile2", "FontFile3"):
+            font_file = _key_xref(doc, descriptor, key)
+            if font_file:
+                yield doc.xref_stream_raw(font_file) or b""
+
+def page_fingerprint(doc: fitz.Document, page_num: int,
+                     font_digests: Optional[Dict[int, bytes]] = None) -> str:
+    """
+    Hash everything that determines a page's extracted text.
+    
+    Covers the page content streams, the streams of the XObjects it draws and
+    the fonts it uses: their names and encodings, ToUnicode maps and embedded
+    programs, but not their document-specific xrefs, so the same slide gets
+    the same key in any PDF it is merged into. Pass the same font_digests
+    dict for pages of one document to hash each font's streams only once.
+    """
+    if font_digests is None:
+        font_digests = {}
+    page = doc.load_page(page_num - 1)
+    digest = hashlib.sha256(_PAGE_CACHE_VERSION)
+    digest.update(page.read_contents())
+    for xref, *_ in page.get_xobjects():
+        digest.update(doc.xref_stream(xref) or b"")
+    for font in page.get_fonts():
+        # (xref, ext, type, basefont, name, encoding[, referencer]): the xrefs
+        # differ between documents
+        xref = font[0]
+        digest.update(repr(font[1:6]).encode("utf-8"))
+        if xref not in font_digests:
+            font_hash = hashlib.sha256()
+            for stream in _font_streams(doc, xref):
+                font_hash.update(hashlib.sha256(stream).digest())
+            font_digests[xref] = font_hash.digest()
+        digest.update(font_digests[xref])
+    return digest.hexdigest()
+
+def get_page_cache() -> Optional[SqliteCache]:
+    """Shared on-disk page text cache, or None when PAGE_CACHE_MB is 0"""
+    global _page_cache
+    if config.PAGE_CACHE_MB <= 0:
+        return None
+    if _page_cache is None:
+        _page_cache = SqliteCache("page_cache.sqlite3", config.PAGE_CACHE_MB * 1024 * 1024)
+    _page_cache.max_bytes = config.PAGE_CACHE_MB * 1024 * 1024
+    return _page_cache
+
+def read_pages(doc: fitz.Document, page_nums: List[int], cache: Optional[SqliteCache] = None,
+               executor: Optional[ProcessPoolExecutor] = None, workers: int = 1,
+               cache_stats: Optional[Dict[str, int]] = None, file_num: int = 0) -> Dict[int, Tuple[str, str]]:
+    """
+    Extract raw and cleaned text for the given pages.
+
+    Pages found in cache (keyed by page_fingerprint) skip text extraction, and
+    newly extracted pages are added to it. When an executor from page_pool is
+    given, the remaining pages are split into contiguous shards across its
+    workers, which read them from the pool's PDF number file_num (doc being
+    this process's copy of it); only page numbers and extracted text cross
+    process boundaries.
+    Hits and misses are added to cache_stats when provided.
+    """
+    pages = {}
+    fingerprints = {}
+
+    if cache is not None:
+        font_digests: Dict[int, bytes] = {}
+        fingerprints = {page_num: page_fingerprint(doc, page_num, font_digests) for page_num in page_nums}
+        cached = cache.get_many(fingerprints.values())
+        for page_num, key in fingerprints.items():
+            if key in cached:
+                pages[page_num] = tuple(json.loads(cached[key]))
+
+    missing = [page_num for page_num in page_nums if page_num not in pages]
+    extracted = _extract_pages(doc, missing, executor, workers, file_num)
+    pages.update(extracted)
+
+    if cache is not None:
+        cache.set_many({fingerprints[page_num]: json.dumps(texts, ensure_ascii=False)
+                        for page_num, texts in extracted.items()})
+        if cache_stats is not None:
+            cache_stats["hits"] = cache_stats.get("hits", 0) + len(page_nums) - len(missing)
+            cache_stats["misses"] = cache_stats.get("misses", 0) + len(missing)
+
+    return pages
+
+def _extract_pages(doc: fitz.Document, page_nums: List[int], executor: Optional[ProcessPoolExecutor],
+                   workers: int, file_num: int = 0) -> Dict[int, Tuple[str, str]]:
+    """Extract pages serially, or across the executor's worker processes"""
+    if executor is None or len(page_nums) < 2:
+        return {page_num: _read_page(doc, page_num) for page_num in page_nums}
+
+    # A few shards per worker keeps the pool busy when page costs are uneven
+    shard_size = -(-len(page_nums) // (workers * 4))
+    shards = [page_nums[i:i + shard_size] for i in range(0, len(page_nums), shard_size)]
+
+    pages = {}
+    tagged = [(file_num, shard) for shard in shards]
+    for shard, shard_pages in zip(shards, executor.map(_read_page_shard, tagged)):
+        pages.update(zip(shard, shard_pages))
+    return pages
+
+@contextmanager
+def page_pool(sources: List[PdfSource], workers: int) -> Iterator[Optional[ProcessPoolExecutor]]:
+    """
+    Process pool for reading pages of sources, or None when workers <= 1.
+    
+    Each worker receives the sources once, when it starts, and keeps the
+    one it last read open, so one pool serves a run over several files.
+    """
+    if workers <= 1:
+        yield None
+        return
+    # Workers cannot share an open document; give them its serialized form
+    sources = [source.tobytes() if isinstance(source, fitz.Document) else source for source in sources]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_page_worker,
+                             initargs=(sources,)) as executor:
+        yield executor
+
+def is_zero_indexed(first_title: str) -> bool:
+    """Whether lecture numbering starts at 0, judging by the first title (e.g. '0. Intro')"""
+    return bool(re.match(r'^0+($|[^0-9])', first_title.strip()))
+
+def build_toc_flat(doc: fitz.Document) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Read the document TOC into chapters.
+    
+    Returns:
+        (toc_flat, toc_entries): the level 1/2 chapters with their page ranges,
+        and every non-blank TOC entry
+    """
+    toc = doc.get_toc()
+
+    if not toc:
+        raise HTTPException(status_code=400, detail="No table of contents found in PDF")
+
+    ZERO_INDEXED = is_zero_indexed(toc[0][1])
+
+    toc_entries = [
+        {"level": level, "title": title, "start_page": start_page}
+        for level, title, start_page in toc
+        if title.strip() != "Blank Page"
+    ]
+
+    toc_level_1_2 = [e for e in toc_entries if e["level"] in (1, 2)]
+    toc_level_1_2.sort(key=lambda x: x["start_page"])
+
+    seen_pages = set()
+    filtered_toc = []
+    for entry in toc_level_1_2:
+        if entry["start_page"] not in seen_pages:
+            filtered_toc.append(entry)
+            seen_pages.add(entry["start_page"])
+
+    toc_flat = []
+    for new_index, entry in enumerate(filtered_toc):
+        toc_flat.append(OrderedDict([
+            ("index", new_index + 1 * (not ZERO_INDEXED)),
+            ("level", entry["level"]),
+            ("start_page", entry["start_page"]),
+            ("end_page", None),
+            ("title", entry["title"])
+        ]))
+
+    for i in range(len(toc_flat)):
+        next_start = toc_flat[i + 1]["start_page"] if i + 1 < len(toc_flat) else len(doc) + 1
+        toc_flat[i]["end_page"] = next_start - 1
+
+    return toc_flat, toc_entries
+
+class PageTextStore:
+    """
+    (raw, cleaned) page texts held between the boilerplate pass and chapter
+    assembly. With spill, texts go to an anonymous temp file and only their
+    offsets stay in memory, so holding the deck costs disk rather than RSS.
+    """
+
+    def __init__(self, spill: bool = False):
+        self._pages: Dict[Hashable, Any] = {}
+        self._file = tempfile.TemporaryFile(dir=get_temp_dir()) if spill else None
+
+    def put(self, key: Hashable, texts: Tuple[str, str]) -> None:
+        if self._file is None:
+            self._pages[key] = texts
+            return
+        data = json.dumps(texts, ensure_ascii=False).encode("utf-8")
+        offset = self._file.seek(0, 2)
+        self._file.write(data)
+        self._pages[key] = (offset, len(data))
+
+    def pop(self, key: Hashable) -> Tuple[str, str]:
+        entry = self._pages.pop(key)
+        if self._file is None:
+            return entry
+        offset, length = entry
+        self._file.seek(offset)
+        return tuple(json.loads(self._file.read(length).decode("utf-8")))
+
+    def close(self) -> None:
+        self._pages.clear()
+        if self._file is not None:
+            self._file.close()
+
+def build_boilerplate_index(doc: fitz.Document, page_nums: List[int], cache: Optional[SqliteCache] = None,
+                            executor: Optional[ProcessPoolExecutor] = None, workers: int = 1,
+                            cache_stats: Optional[Dict[str, int]] = None, keep: Optional[Set[int]] = None,
+                            batch_size: int = 64) -> Tuple[BoilerplateIndex, PageTextStore]:
+    """
+    Count raw page lines across the deck to find repeated headers and footers.
+    
+    This is the only pass that extracts the pages: the (raw, cleaned) texts of
+    the pages in keep (all of them when None) are returned with the index, so
+    the chapter pass strips and assembles them without extracting any page a
+    second time, cached or not. With config.LOW_MEMORY the texts are spilled
+    to disk and the MuPDF store is trimmed after every batch.
+    """
+    index = BoilerplateIndex(config.BOILERPLATE_MIN_FRACTION)
+    store = PageTextStore(spill=config.LOW_MEMORY)
+    for i in range(0, len(page_nums), batch_size):
+        batch = read_pages(doc, page_nums[i:i + batch_size], cache, executor, workers, cache_stats)
+        index.add_pages(raw for raw, _ in batch.values())
+        for page_num, texts in batch.items():
+            if keep is None or page_num in keep:
+                store.put(page_num, texts)
+        if config.LOW_MEMORY:
+            trim_mupdf_store(config.MUPDF_STORE_MB)
+    return index, store
+
+def strip_boilerplate(pages: Dict[int, Tuple[str, str]], index: BoilerplateIndex) -> Dict[int, Tuple[str, str]]:
+    """Remove boilerplate lines from (raw, cleaned) page texts and re-clean the pages that changed"""
+    stripped = {}
+    for page_num, (raw, cleaned) in pages.items():
+        raw_stripped = index.strip(raw)
+        stripped[page_num] = (raw, cleaned) if raw_stripped == raw else (raw_stripped, extract_clean_paragraphs(raw_stripped))
+    return stripped
+
+def new_dedup_index() -> Optional[NearDuplicateIndex]:
+    """Near-duplicate index for the configured threshold, or None for exact previous-page checks"""
+    if config.DEDUP_THRESHOLD >= 1:
+        return None
+    return NearDuplicateIndex(config.DEDUP_THRESHOLD)
+
+def filter_chapter_pages(title: str, pages: List[Tuple[str, str]],
+                         dedup_index: Optional[NearDuplicateIndex] = None) -> List[Tuple[str, str]]:
+    """
+    The (raw, cleaned) page texts of a chapter that make it into its content.
+    
+    Animation build-ups are collapsed to their final page first when
+    config.COLLAPSE_BUILDS is set. With a dedup_index, pages that nearly
+    repeat any page already in the index are then dropped (and the rest are
+    added to it); otherwise only exact repeats of the previous page are.
+    """
+    if config.COLLAPSE_BUILDS:
+        kept = collapse_builds([cleaned for _, cleaned in pages])
+        if len(kept) < len(pages):
+            kept_set = set(kept)
+            dropped = [cleaned for i, (_, cleaned) in enumerate(pages) if i not in kept_set]
+            print(f"Collapsed {len(dropped)} build pages in '{title}': saved "
+                  f"{sum(map(len, dropped))} characters (~{sum(map(estimate_tokens, dropped))} tokens)")
+            pages = [pages[i] for i in kept]
+
+    chapter_pages = []
+    previous_page_content = None
+    
+    for current_page_text, current_page_cleaned in pages:
+        if dedup_index is not None:
+            if not dedup_index.add_if_new(current_page_cleaned):
+                continue
+        # Skip if this page is very similar to the previous page
+        elif previous_page_content and is_similar_content(previous_page_content, current_page_cleaned):
+            continue
             
-            for page_num in range(current["start_page"], next_start):
-                page = doc.load_page(page_num - 1)
-                current_page_text = page.get_text()
-                current_page_cleaned = extract_clean_paragraphs(current_page_text)
-                
-                # Skip if this page is very similar to the previous page
-                if previous_page_content and is_similar_content(previous_page_content, current_page_cleaned):
-                    continue
-                    
-                chapter_text += current_page_text
-                previous_page_content = current_page_cleaned
-
-            cleaned_content = extract_clean_paragraphs(chapter_text)
-            fixed_content = insert_period_after_title_match(current["title"], cleaned_content)
-            fixed_content = normalize_text(fixed_content)
-            current["content"] = fixed_content
-
-        for entry in toc_entries:
-            if entry["level"] >= 2:
-                page = entry["start_page"]
-                try:
-                    level3_page_text = extract_clean_paragraphs(doc.load_page(page - 1).get_text())
-                except Exception:
-                    continue
+        chapter_pages.append((current_page_text, current_page_cleaned))
+        previous_page_content = current_page_cleaned
 
-                for parent in toc_flat:
-                    if parent["start_page"] <= page <= parent["end_page"]:
-                        updated_content = insert_period_after_title_match(entry["title"], parent["content"])
-                        updated_content = normalize_text(updated_content)
-                        parent["content"] = updated_content
-                        break
+    return chapter_pages
 
-        doc.close()
-        return toc_flat
+def assemble_chapter(title: str, sub_headings: List[str], pages: List[Tuple[str, str]],
+                     dedup_index: Optional[NearDuplicateIndex] = None) -> str:
+    """Build a chapter's normalized content from its (raw, cleaned) page texts, see filter_chapter_pages"""
+    chapter_pages = filter_chapter_pages(title, pages, dedup_index)
+
+    # Reuse the per-page cleaned text instead of re-cleaning the whole chapter
+    cleaned_content = join_cleaned_pages(chapter_pages)
+
+    # Mark the chapter title and every sub-heading in a single scan
+    fixed_content = insert_periods_after_titles([title] + sub_headings, cleaned_content)
+    return normalize_text(fixed_content)
+
+def iter_toc_entries_with_content(pdf: PdfSource, workers: Optional[int] = None,
+                                  index_range: Optional[Tuple[int, int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield table of contents entries with content, one chapter at a time.
+    
+    The TOC is read in full up front so indices match a full extraction, but
+    pages are only extracted for the chapter being built, so memory stays
+    proportional to a single chapter. Chapters outside index_range are not
+    emitted, and are only read where the deck-wide filters need them to give
+    the same text as a full extraction: the boilerplate count covers every
+    page, and with DEDUP_SCOPE "deck" the chapters before the last selected
+    one are run through the near-duplicate index.
+    With config.STRIP_BOILERPLATE, the pages are instead extracted in a first
+    pass over the deck that also counts repeated header/footer lines, and
+    the texts of the chapters still needed are held until they are built
+    with the boilerplate removed.
+    
+    With config.LOW_MEMORY, pages are extracted in this process only, the
+    texts held for the boilerplate pass are spilled to disk, and MuPDF's
+    resource store is flushed after each chapter once it grows past
+    config.MUPDF_STORE_MB; the process peak RSS and how much this extraction
+    raised it are logged at the end.
+    
+    Args:
+        pdf: PDF file content as bytes, the path of a PDF file, or an open document
+            (left open for its owner)
+        workers: Extraction worker processes (defaults to config.EXTRACT_WORKERS)
+        index_range: Optional (start, stop) chapter indices to extract, stop exclusive
+    """
+    if workers is None:
+        workers = config.EXTRACT_WORKERS
+    if config.LOW_MEMORY:
+        # Every pool worker would hold its own copy of the document
+        workers = 1
+    rss_baseline = peak_rss_mb() if config.LOW_MEMORY else None
+
+    doc = open_pdf(pdf)
+    deck_texts = None
+    
+    try:
+        toc_flat, toc_entries = build_toc_flat(doc)
+        sub_headings = assign_sub_headings(toc_flat, toc_entries)
+        chapters = list(zip(toc_flat, sub_headings))
+        selected = [index_range is None or index_range[0] <= entry["index"] < index_range[1]
+                    for entry, _ in chapters]
+        cache = get_page_cache()
+        cache_stats = {}
+        deck_index = new_dedup_index() if config.DEDUP_SCOPE == "deck" else None
+        last_selected = max((i for i, is_selected in enumerate(selected) if is_selected), default=-1)
+        needed = [is_selected or (deck_index is not None and i < last_selected)
+                  for i, is_selected in enumerate(selected)]
+
+        with page_pool([pdf], workers) as executor:
+            boilerplate = None
+            if config.STRIP_BOILERPLATE and last_selected >= 0:
+                deck_pages = sorted({page_num for entry, _ in chapters
+                                     for page_num in range(entry["start_page"], entry["end_page"] + 1)})
+                keep = {page_num for (entry, _), is_needed in zip(chapters, needed) if is_needed
+                        for page_num in range(entry["start_page"], entry["end_page"] + 1)}
+                boilerplate, deck_texts = build_boilerplate_index(doc, deck_pages, cache, executor, workers,
+                                                                  cache_stats, keep)
+                print(f"Boilerplate: {len(boilerplate.boilerplate)} repeated lines across {boilerplate.page_count} pages")
+
+            for (current, chapter_sub_headings), is_selected, is_needed in zip(chapters, selected, needed):
+                if not is_needed:
+                    continue
+                page_nums = list(range(current["start_page"], current["end_page"] + 1))
+                if boilerplate is not None:
+                    # Already extracted by the boilerplate pass; released as chapters finish
+                    pages = strip_boilerplate({page_num: deck_texts.pop(page_num) for page_num in page_nums}, boilerplate)
+                else:
+                    pages = read_pages(doc, page_nums, cache, executor, workers, cache_stats)
+                chapter_pages = [pages[page_num] for page_num in page_nums]
+                del pages
+
+                chapter = None
+                if is_selected:
+                    chapter = OrderedDict(current)
+                    chapter["content"] = assemble_chapter(
+                        current["title"], chapter_sub_headings, chapter_pages,
+                        deck_index if deck_index is not None else new_dedup_index()
+                    )
+                else:
+                    # Outside the range, but its pages count as seen, as in a full extraction
+                    filter_chapter_pages(current["title"], chapter_pages, deck_index)
+
+                # Only the finished chapter is held while the consumer works on it
+                del chapter_pages
+                if config.LOW_MEMORY:
+                    trim_mupdf_store(config.MUPDF_STORE_MB)
+                if chapter is not None:
+                    yield chapter
+
+        if cache is not None:
+            print(f"Page cache: {cache_stats.get('hits', 0)} hits, {cache_stats.get('misses', 0)} misses")
+        if config.LOW_MEMORY:
+            print(peak_rss_report(rss_baseline))
     
     finally:
-        # Clean up temporary file
-        try:
-            temp_file_path.unlink()
-        except Exception:
-            pass
-
-async def extract_content_from_pdf(pdf_bytes: bytes) -> List[Dict[str, Any]]:
+        if deck_texts is not None:
+            deck_texts.close()
+        if doc is not pdf:
+            doc.close()
+
+def extract_all_toc_entries_with_content(pdf: PdfSource, workers: Optional[int] = None,
+                                         index_range: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+    """Extract table of contents entries with content from PDF bytes or a PDF file path"""
+    return list(iter_toc_entries_with_content(pdf, workers, index_range))
+
+def config_index_range() -> Tuple[int, int]:
+    """Chapter indices selected by config.START and config.NUM_LECS"""
+    return config.START, config.START + config.NUM_LECS
+
+# Extracted lectures as returned to the routers: a list, or with
+# config.LOW_MEMORY their saved file, read back on demand
+Lectures = Union[List[Dict[str, Any]], SavedJsonItems]
+
+# Private copies of extracted lectures in LOW_MEMORY mode, kept out of the temp listing
+EXTRACTED_DIRNAME = "extracted"
+
+def iter_lectures(pdf: PdfSource, index_range: Optional[Tuple[int, int]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield extracted lectures as index/title/content dictionaries, one chapter at a time"""
+    # Remove level, start_page, end_page fields for API response (matches original script)
+    for entry in iter_toc_entries_with_content(pdf, index_range=index_range):
+        yield {
+            "index": entry["index"],
+            "title": entry["title"],
+            "content": entry["content"]
+        }
+
+async def extract_content_from_pdf(pdf: PdfSource,
+                                   index_range: Optional[Tuple[int, int]] = None) -> Lectures:
     """
     Extract content from PDF and return structured data.
     
     Args:
-        pdf_bytes: PDF file content as bytes
+        pdf: PDF file content as bytes, the path of a PDF file, or an open document
+        index_range: Optional (start, stop) lecture indices to extract, stop exclusive
         
     Returns:
-        List of dictionaries containing extracted lecture data
+        List of dictionaries containing extracted lecture data, or their saved
+        file in LOW_MEMORY mode (see save_extracted_lectures)
     """
     try:
-        toc_content = extract_all_toc_entries_with_content(pdf_bytes)
+        return save_extracted_lectures(iter_lectures(pdf, index_range))
         
-        # Remove level, start_page, end_page fields for API response (matches original script)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error extracting content from PDF: {str(e)}")
+
+def save_extracted_lectures(lectures: Iterator[Dict[str, Any]]) -> Lectures:
+    """
+    Write each lecture to temp/extracted_lectures.json as it finishes.
+    
+    Normally the lectures are also collected and returned as a list. With
+    config.LOW_MEMORY nothing is collected: the lectures are streamed to a
+    file private to this request, which is copied to extracted_lectures.json
+    and returned as SavedJsonItems that read it back one lecture at a time.
+    The caller deletes it when done.
+    """
+    if not config.LOW_MEMORY:
         result = []
-        for entry in toc_content:
-            result.append({
-                "index": entry["index"],
-                "title": entry["title"],
-                "content": entry["content"]
-            })
+        
+        def collect():
+            for lecture in lectures:
+                result.append(lecture)
+                yield lecture
         
         # Save extracted content to local temp directory for later use
         # This matches the original script behavior of saving filtered JSON
-        extracted_json_path = save_temp_json(result, "extracted_lectures.json")
+        extracted_json_path = save_temp_json_items(collect(), "extracted_lectures.json")
         print(f"Extracted content saved to: {extracted_json_path}")
         
         return result
+
+    count = 0
+
+    def counted():
+        nonlocal count
+        for lecture in lectures:
+            count += 1
+            yield lecture
+
+    (get_temp_dir() / EXTRACTED_DIRNAME).mkdir(exist_ok=True)
+    private_path = save_temp_json_items(counted(), f"{EXTRACTED_DIRNAME}/{uuid.uuid4().hex}.json")
+    try:
+        # Another request may be replacing the shared copy; publish ours atomically
+        extracted_json_path = get_temp_file_path("extracted_lectures.json")
+        partial_path = extracted_json_path.with_name(f"{extracted_json_path.name}.{uuid.uuid4().hex}.part")
+        shutil.copyfile(private_path, partial_path)
+        os.replace(partial_path, extracted_json_path)
+    except BaseException:
+        private_path.unlink()
+        raise
+    print(f"Extracted content saved to: {extracted_json_path} ({count} lectures, read back on demand)")
+    
+    return SavedJsonItems(private_path, count)
+
+def _iter_file_pages(file_num: int, content: PdfSource, executor: Optional[ProcessPoolExecutor] = None,
+                     workers: int = 1, cache: Optional[SqliteCache] = None,
+                     cache_stats: Optional[Dict[str, int]] = None,
+                     batch_size: int = 64) -> Iterator[List[Tuple[int, Tuple[str, str]]]]:
+    """
+    (page number, (raw, cleaned)) texts of one PDF in batches of pages.
+    
+    content is PDF number file_num of the run's page_pool, when there is one.
+    The file is open only until the last batch is taken, so files read one
+    after another are never open together. With config.LOW_MEMORY the MuPDF
+    store is trimmed after every batch.
+    """
+    doc = open_pdf(content)
+    try:
+        page_nums = list(range(1, doc.page_count + 1))
+        for i in range(0, len(page_nums), batch_size):
+            batch_nums = page_nums[i:i + batch_size]
+            batch = read_pages(doc, batch_nums, cache, executor, workers, cache_stats, file_num)
+            if config.LOW_MEMORY:
+                trim_mupdf_store(config.MUPDF_STORE_MB)
+            yield [(page_num, batch[page_num]) for page_num in batch_nums]
+    finally:
+        doc.close()
+
+def iter_lectures_from_files(validated: List[Tuple[str, PdfSource, int]],
+                             index_range: Optional[Tuple[int, int]] = None,
+                             workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one lecture per uploaded PDF, without merging them or reading a TOC.
+    
+    Index and title match the chapter merge_pdfs would bookmark for each file,
+    so results are the same as extracting the merged document. Files are
+    opened one at a time and closed before the next, with their pages split
+    across the EXTRACT_WORKERS processes of one pool shared by the run; the page filters then run as in
+    iter_toc_entries_with_content, with every file counting towards the
+    boilerplate and, with DEDUP_SCOPE "deck", the near-duplicate index.
+    With config.STRIP_BOILERPLATE, a first pass reads every file to count
+    repeated lines and holds the texts of the files still needed (spilled
+    to disk with config.LOW_MEMORY) until they are built.
+    
+    Args:
+        validated: (filename, content, page count) tuples in merge order, as returned by validate_pdfs
+        index_range: Optional (start, stop) lecture indices to extract, stop exclusive
+        workers: Extraction worker processes (defaults to config.EXTRACT_WORKERS)
+    """
+    if workers is None:
+        workers = config.EXTRACT_WORKERS
+    if config.LOW_MEMORY:
+        # Every pool worker would hold its own copy of the file
+        workers = 1
+
+    files = [(filename, content) for filename, content, page_count in validated if page_count > 0]
+    if not files:
+        return
+    titles = [bookmark_title_from_filename(filename) for filename, _ in files]
+    index_base = 0 if is_zero_indexed(titles[0]) else 1
+    indices = [index_base + i for i in range(len(files))]
+
+    selected = [index_range is None or index_range[0] <= index < index_range[1] for index in indices]
+    last_selected = max((i for i, is_selected in enumerate(selected) if is_selected), default=-1)
+    if last_selected < 0:
+        return
+    deck_index = new_dedup_index() if config.DEDUP_SCOPE == "deck" else None
+    needed = [is_selected or (deck_index is not None and i < last_selected)
+              for i, is_selected in enumerate(selected)]
+    cache = get_page_cache()
+    cache_stats = {}
+    deck_texts = None
+    rss_baseline = peak_rss_mb() if config.LOW_MEMORY else None
+
+    try:
+        # One pool for the whole run; only the files that will be read are sent to it
+        pool_files = [content if is_needed or config.STRIP_BOILERPLATE else None
+                      for (_, content), is_needed in zip(files, needed)]
+        with page_pool(pool_files, workers) as executor:
+            boilerplate = None
+            page_counts = {}
+            if config.STRIP_BOILERPLATE:
+                boilerplate = BoilerplateIndex(config.BOILERPLATE_MIN_FRACTION)
+                deck_texts = PageTextStore(spill=config.LOW_MEMORY)
+                for file_num, ((_, content), is_needed) in enumerate(zip(files, needed)):
+                    page_counts[file_num] = 0
+                    for batch in _iter_file_pages(file_num, content, executor, workers, cache, cache_stats):
+                        boilerplate.add_pages(raw for _, (raw, _) in batch)
+                        page_counts[file_num] += len(batch)
+                        if is_needed:
+                            for page_num, texts in batch:
+                                deck_texts.put((file_num, page_num), texts)
+                print(f"Boilerplate: {len(boilerplate.boilerplate)} repeated lines across {boilerplate.page_count} pages")
+
+            for file_num, ((_, content), index, title, is_selected, is_needed) in enumerate(
+                    zip(files, indices, titles, selected, needed)):
+                if not is_needed:
+                    continue
+                if boilerplate is not None:
+                    # Already read by the boilerplate pass; released as files finish
+                    page_nums = range(1, page_counts[file_num] + 1)
+                    pages = strip_boilerplate({page_num: deck_texts.pop((file_num, page_num))
+                                               for page_num in page_nums}, boilerplate)
+                    file_pages = [pages[page_num] for page_num in page_nums]
+                    del pages
+                else:
+                    batches = _iter_file_pages(file_num, content, executor, workers, cache, cache_stats)
+                    file_pages = [texts for batch in batches for _, texts in batch]
+
+                lecture = None
+                if is_selected:
+                    lecture = {
+                        "index": index,
+                        "title": title,
+                        "content": assemble_chapter(title, [], file_pages,
+                                                    deck_index if deck_index is not None else new_dedup_index())
+                    }
+                else:
+                    # Outside the range, but its pages count as seen, as in a full extraction
+                    filter_chapter_pages(title, file_pages, deck_index)
+
+                del file_pages
+                if lecture is not None:
+                    yield lecture
+
+        if cache is not None:
+            print(f"Page cache: {cache_stats.get('hits', 0)} hits, {cache_stats.get('misses', 0)} misses")
+        if config.LOW_MEMORY:
+            print(peak_rss_report(rss_baseline))
+
+    finally:
+        if deck_texts is not None:
+            deck_texts.close()
+
+async def extract_content_from_files(pdf_files: List[Tuple[str, PdfSource]],
+                                     index_range: Optional[Tuple[int, int]] = None
+                                     ) -> Tuple[Lectures, MergedPdf]:
+    """
+    Extract one lecture per uploaded PDF (the direct pipeline mode).
+    
+    The merged PDF is returned unassembled; the caller saves it to temp/ for
+    downloads and /extract-content-from-merged (see save_merged_pdf), which
+    reads straight from the merge cache when it already holds these files.
+    
+    Args:
+        pdf_files: List of tuples containing (filename, file content or spooled file path)
+        index_range: Optional (start, stop) lecture indices to extract, stop exclusive
         
+    Returns:
+        Tuple of the extracted lecture data and the deferred merged PDF
+    """
+    if not pdf_files:
+        raise HTTPException(status_code=400, detail="No PDF files provided")
+
+    # Sort files by name to match the merge order
+    pdf_files = sorted(pdf_files, key=lambda x: x[0])
+    validated = await validate_pdfs(pdf_files)
+    if not any(page_count for _, _, page_count in validated):
+        raise HTTPException(status_code=400, detail="No valid PDF content found to merge")
+    
+    try:
+        result = save_extracted_lectures(iter_lectures_from_files(validated, index_range))
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error extracting content from PDF: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error extracting content from PDFs: {str(e)}")
+
+    return result, defer_merge(pdf_files, validated)
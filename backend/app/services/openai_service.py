@@ -1,59 +1,219 @@
 import os
 import time
+import json
 import asyncio
-from typing import Dict, List, Any, Optional
-from openai import OpenAI, RateLimitError
+import hashlib
+from typing import Dict, Iterable, List, Any, Optional
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError
 from fastapi import HTTPException
 
 from ..config import (
     config, system_prompt, guided_system_prompt, user_prompt_1, user_prompt_2, 
-    user_prompt_3, user_prompt_4, user_prompt_5, clean, model_usage
+    user_prompt_3, user_prompt_4, user_prompt_5, clean, model_usage, usage_tokens,
+    cached_ratio
 )
+from .rate_limiter import backoff_delay, estimate_request_tokens, get_rate_limiter, retry_after
 from ..utils.output_utils import save_output_markdown
+from ..utils.sqlite_cache import SqliteCache
+
+SAMPLING_PARAMS = {
+    "temperature": 0.3,
+    "max_tokens": 10000,
+    "top_p": 0.3,
+    "frequency_penalty": 0,
+    "presence_penalty": 0,
+}
+
+# Study notes and key points are generated with this cheaper model unless
+# SHARE_LECTURE_MODEL is set
+NOTES_MODEL = "gpt-4o-mini"
+
+# Retries of dropped connections, timeouts and 5xx responses per call, the
+# OpenAI SDK's own default; rate limits use generate's max_retries instead
+TRANSIENT_RETRIES = 2
+
+# Usage of a call that never reached the API
+NO_TOKENS = {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
+_response_cache: Optional[SqliteCache] = None
+
+def get_response_cache() -> Optional[SqliteCache]:
+    """Shared on-disk cache of completions, or None when LLM_CACHE_MB is 0"""
+    global _response_cache
+    if config.LLM_CACHE_MB <= 0:
+        return None
+    if _response_cache is None:
+        _response_cache = SqliteCache("llm_cache.sqlite3", config.LLM_CACHE_MB * 1024 * 1024)
+    _response_cache.max_bytes = config.LLM_CACHE_MB * 1024 * 1024
+    _response_cache.ttl = config.LLM_CACHE_TTL_DAYS * 86400 or None
+    return _response_cache
+
+def response_cache_key(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+    """Hash of everything that determines a completion"""
+    payload = json.dumps({"model": model, "messages": messages, "params": params},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def lecture_messages(lec_prompt_1: str, study_notes: Optional[str] = None, *turns: str) -> List[Dict[str, str]]:
+    """
+    Messages for one call about a lecture.
+
+    Every call starts with the same system prompt, lecture prompt and (after
+    step 1) study notes, and only the trailing turns differ, so the calls of a
+    lecture share one long prefix that the provider can serve from its prompt
+    cache. Turns alternate user and assistant, starting with user.
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": lec_prompt_1}
+    ]
+    if study_notes is not None:
+        messages.append({"role": "assistant", "content": study_notes})
+    for i, turn in enumerate(turns):
+        messages.append({"role": "user" if i % 2 == 0 else "assistant", "content": turn})
+    return messages
+
+def call_usage(step: Optional[str], model: str, tokens: Dict[str, int], response_cached: bool = False) -> Dict[str, Any]:
+    """Token usage record of one generate call"""
+    return {
+        "step": step,
+        "model": model,
+        "prompt_tokens": tokens["prompt_tokens"],
+        "cached_tokens": tokens["cached_tokens"],
+        "completion_tokens": tokens["completion_tokens"],
+        "cached_token_ratio": cached_ratio(tokens["prompt_tokens"], tokens["cached_tokens"]),
+        "response_cached": response_cached,
+    }
+
+def usage_totals(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Prompt and cached prompt tokens summed over several calls"""
+    prompt = sum(call["prompt_tokens"] for call in calls)
+    cached = sum(call["cached_tokens"] for call in calls)
+    return {
+        "prompt_tokens": prompt,
+        "cached_tokens": cached,
+        "cached_token_ratio": cached_ratio(prompt, cached),
+    }
 
 class OpenAIService:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, use_cache: bool = True):
+        # Async client so completions yield to the event loop and concurrent
+        # lectures/subtasks actually overlap. Retries are ours so every
+        # lecture shares one backoff per model on rate limits; other
+        # transient errors are retried per call, as the SDK would
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0)
         self.total_cost = 0.0
+        # Without use_cache responses are still stored, just never read
+        self.use_cache = use_cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cached_cost = 0.0
+        # Usage of every call made through this service
+        self.calls: List[Dict[str, Any]] = []
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Response cache hits of this service, for ProcessingResponse"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": self.cache_hits / lookups if lookups else 0.0,
+            "cached_cost": self.cached_cost,
+        }
+
+    def usage_stats(self) -> Dict[str, Any]:
+        """Prompt cache use over every call of this service, for ProcessingResponse"""
+        return usage_totals(self.calls)
 
-    async def generate(self, messages: List[Dict[str, str]], model: str = None, max_retries: int = 120) -> tuple[str, float]:
-        """Generate text using OpenAI API with retry logic"""
+    async def generate(self, messages: List[Dict[str, str]], model: str = None, max_retries: int = 10,
+                       calls: Optional[List[Dict[str, Any]]] = None, step: Optional[str] = None) -> tuple[str, float]:
+        """
+        Generate text using OpenAI API with rate limiting and retry logic
+
+        The usage of the call is recorded on the service and, when given, appended
+        to calls under the name step.
+        """
         if model is None:
             model = config.MODEL
-            
+
+        def record(tokens: Dict[str, int], response_cached: bool = False):
+            usage = call_usage(step, model, tokens, response_cached)
+            self.calls.append(usage)
+            if calls is not None:
+                calls.append(usage)
+
+        cache = get_response_cache()
+        key = response_cache_key(model, messages, SAMPLING_PARAMS)
+        if cache is not None and self.use_cache:
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                entry = json.loads(cached)
+                self.cache_hits += 1
+                self.cached_cost += entry["cost"]
+                record(NO_TOKENS, response_cached=True)
+                return entry["content"], 0.0
+            self.cache_misses += 1
+
+        limiter = get_rate_limiter(model)
+        reserved = estimate_request_tokens(messages, SAMPLING_PARAMS["max_tokens"])
+
         retries = 0
+        transient = 0
         while retries <= max_retries:
+            await limiter.acquire(reserved)
             try:
                 start = time.time()
-                completion = self.client.chat.completions.create(
+                completion = await self.client.chat.completions.create(
                     model=model,
                     messages=messages,
-                    temperature=0.3,
-                    max_tokens=10000,
-                    top_p=0.3,
-                    frequency_penalty=0,
-                    presence_penalty=0
+                    **SAMPLING_PARAMS
                 )
 
                 elapsed = time.time() - start
-                print(f"Completion took {elapsed:.2f} seconds")
+                limiter.settle(reserved, getattr(completion.usage, "total_tokens", None))
                 
                 try:
+                    tokens = usage_tokens(completion.usage)
                     cost = model_usage(completion.usage, model)
                 except Exception as e:
                     print(f"Error getting model usage: {e}")
+                    tokens = NO_TOKENS
                     cost = 0
 
+                record(tokens)
+                print(f"Completion took {elapsed:.2f} seconds, {tokens['cached_tokens']}/{tokens['prompt_tokens']} "
+                      f"prompt tokens cached ({cached_ratio(tokens['prompt_tokens'], tokens['cached_tokens']):.0%})")
+
                 self.total_cost += cost
-                return completion.choices[0].message.content, cost
+                content = completion.choices[0].message.content
+                if cache is not None and content:
+                    entry = json.dumps({"content": content, "cost": cost}, ensure_ascii=False)
+                    await asyncio.to_thread(cache.set, key, entry)
+                return content, cost
 
             except RateLimitError as e:
+                # Rejected requests use no tokens; return the reservation
+                limiter.settle(reserved, 0)
                 retries += 1
                 if retries <= max_retries:
-                    print(f"Rate limit hit - waiting 10s (retry {retries}/{max_retries})")
-                    await asyncio.sleep(10)
+                    response = getattr(e, "response", None)
+                    delay = backoff_delay(retries, retry_after(getattr(response, "headers", None)))
+                    # Pause the whole model, not just this call, so queued
+                    # requests don't walk into the same limit
+                    limiter.pause(delay)
+                    print(f"Rate limit hit - waiting {delay:.1f}s (retry {retries}/{max_retries})")
                 else:
                     raise HTTPException(status_code=429, detail="OpenAI rate limit exceeded")
+            except (APIConnectionError, InternalServerError) as e:
+                # Includes timeouts; unlike rate limits these say nothing
+                # about the other calls, so only this one backs off
+                limiter.settle(reserved, 0)
+                transient += 1
+                if transient > TRANSIENT_RETRIES:
+                    raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
+                delay = backoff_delay(transient)
+                print(f"OpenAI API error: {e} - waiting {delay:.1f}s (retry {transient}/{TRANSIENT_RETRIES})")
+                await asyncio.sleep(delay)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
 
@@ -66,12 +226,17 @@ class OpenAIService:
         print(f"Processing {lecture_id}: {title}")
 
         lec_prompt_1 = user_prompt_1 + title + "\n\n" + content
+        model = config.MODEL
+        # Prompt caches are per model, so only with SHARE_LECTURE_MODEL do all
+        # steps of a lecture share one
+        notes_model = model if config.SHARE_LECTURE_MODEL else NOTES_MODEL
+        calls = []
 
-        # Step 1: Generate study notes
-        study_notes, cost1 = await self.generate([
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": lec_prompt_1}
-        ], model='gpt-4o-mini')
+        # Step 1: Generate study notes, which also warms the cache for the
+        # system prompt and lecture that every later step starts with
+        study_notes, cost1 = await self.generate(
+            lecture_messages(lec_prompt_1), notes_model, calls=calls, step="study_notes"
+        )
 
         results = {
             "index": lecture_id,
@@ -84,13 +249,13 @@ class OpenAIService:
         tasks = []
 
         if config.GET_TRANSCRIPTS:
-            tasks.append(self._generate_transcript(lec_prompt_1, study_notes))
+            tasks.append(self._generate_transcript(lec_prompt_1, study_notes, model, calls))
 
         if config.GET_Q_AND_A:
-            tasks.append(self._generate_questions_and_answers(lec_prompt_1, study_notes))
+            tasks.append(self._generate_questions_and_answers(lec_prompt_1, study_notes, model, calls))
 
         if config.GET_KEY_POINTS:
-            tasks.append(self._generate_key_points(lec_prompt_1, study_notes))
+            tasks.append(self._generate_key_points(lec_prompt_1, study_notes, notes_model, calls))
 
         # Execute tasks concurrently
         if tasks:
@@ -104,6 +269,10 @@ class OpenAIService:
                 if isinstance(result, dict):
                     results.update(result)
 
+        results.update(usage_totals(calls), model=model, calls=calls)
+        print(f"Lecture {lecture_id}: {results['cached_tokens']}/{results['prompt_tokens']} "
+              f"prompt tokens cached ({results['cached_token_ratio']:.0%})")
+
         # Generate markdown content and save to outputs directory
         markdown_content = self._generate_markdown_content(results)
         filename = f"lecture_{lecture_id:02d}_{title.replace(' ', '_').replace('/', '_')}.md"
@@ -157,39 +326,33 @@ class OpenAIService:
         
         return "\n".join(content)
 
-    async def _generate_transcript(self, lec_prompt_1: str, study_notes: str) -> Dict[str, Any]:
+    async def _generate_transcript(self, lec_prompt_1: str, study_notes: str, model: str,
+                                   calls: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate lecture transcript"""
-        transcript, cost = await self.generate([
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": lec_prompt_1},
-            {"role": "assistant", "content": study_notes},
-            {"role": "user", "content": user_prompt_2 + '\n\n' + guided_system_prompt}
-        ])
+        transcript, cost = await self.generate(
+            lecture_messages(lec_prompt_1, study_notes, user_prompt_2 + '\n\n' + guided_system_prompt),
+            model, calls=calls, step="transcript"
+        )
         
         return {
             "transcript": transcript,
             "transcript_cost": cost
         }
 
-    async def _generate_questions_and_answers(self, lec_prompt_1: str, study_notes: str) -> Dict[str, Any]:
+    async def _generate_questions_and_answers(self, lec_prompt_1: str, study_notes: str, model: str,
+                                              calls: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate questions and answers"""
         # Generate questions
-        questions, cost1 = await self.generate([
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": lec_prompt_1},
-            {"role": "assistant", "content": study_notes},
-            {"role": "user", "content": user_prompt_3}
-        ])
+        questions, cost1 = await self.generate(
+            lecture_messages(lec_prompt_1, study_notes, user_prompt_3),
+            model, calls=calls, step="questions"
+        )
         
-        # Generate answers
-        answers, cost2 = await self.generate([
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": lec_prompt_1},
-            {"role": "assistant", "content": study_notes},
-            {"role": "user", "content": user_prompt_3},
-            {"role": "assistant", "content": questions},
-            {"role": "user", "content": user_prompt_4}
-        ])
+        # Generate answers, extending the questions call's prompt
+        answers, cost2 = await self.generate(
+            lecture_messages(lec_prompt_1, study_notes, user_prompt_3, questions, user_prompt_4),
+            model, calls=calls, step="answers"
+        )
 
         return {
             "questions": clean(questions),
@@ -197,50 +360,44 @@ class OpenAIService:
             "qa_cost": cost1 + cost2
         }
 
-    async def _generate_key_points(self, lec_prompt_1: str, study_notes: str) -> Dict[str, Any]:
+    async def _generate_key_points(self, lec_prompt_1: str, study_notes: str, model: str,
+                                   calls: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate key points"""
-        key_points, cost = await self.generate([
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": lec_prompt_1},
-            {"role": "assistant", "content": study_notes},
-            {"role": "user", "content": user_prompt_5}
-        ], model='gpt-4o-mini')
+        key_points, cost = await self.generate(
+            lecture_messages(lec_prompt_1, study_notes, user_prompt_5),
+            model, calls=calls, step="key_points"
+        )
 
         return {
             "key_points": clean(key_points),
             "key_points_cost": cost
         }
 
-    async def process_multiple_lectures(self, lectures: List[Dict[str, Any]], 
+    async def process_multiple_lectures(self, lectures: Iterable[Dict[str, Any]], 
                                       max_concurrent: int = 3) -> List[Dict[str, Any]]:
-        """Process multiple lectures with concurrency control"""
-        semaphore = asyncio.Semaphore(max_concurrent)
-        
-        async def process_with_semaphore(lecture):
-            async with semaphore:
-                return await self.process_lecture(lecture)
+        """
+        Process multiple lectures with concurrency control.
         
+        Up to max_concurrent workers take the next lecture from lectures only
+        when they are free, so a lazily read iterable (see SavedJsonItems) is
+        never held in memory all at once. Results keep the input order.
+        """
         # Filter lectures based on config
-        filtered_lectures = []
-        for lecture in lectures:
-            lecture_id = lecture['index']
-            if config.START <= lecture_id < config.START + config.NUM_LECS:
-                filtered_lectures.append(lecture)
-        
-        if not filtered_lectures:
-            return []
-
-        results = await asyncio.gather(
-            *[process_with_semaphore(lecture) for lecture in filtered_lectures],
-            return_exceptions=True
+        filtered_lectures = (
+            (position, lecture) for position, lecture in enumerate(lectures)
+            if config.START <= lecture['index'] < config.START + config.NUM_LECS
         )
+        results = []
+
+        async def worker():
+            # Workers share the generator; it is only advanced between awaits
+            for position, lecture in filtered_lectures:
+                try:
+                    results.append((position, await self.process_lecture(lecture)))
+                except Exception as e:
+                    # Skip failed lectures and keep the successful results
+                    print(f"Lecture processing failed: {e}")
 
-        # Filter out exceptions and return successful results
-        successful_results = []
-        for result in results:
-            if isinstance(result, Exception):
-                print(f"Lecture processing failed: {result}")
-                continue
-            successful_results.append(result)
+        await asyncio.gather(*[worker() for _ in range(max(1, max_concurrent))])
 
-        return successful_results
+        return [result for _, result in sorted(results, key=lambda item: item[0])]
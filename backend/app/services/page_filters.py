@@ -0,0 +1,179 @@
+"""
+Filters that drop redundant slide pages before a chapter is assembled.
+
+Like text_normalizer, these work on cleaned page text only and do not need
+PyMuPDF.
+"""
+
+import hashlib
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+
+_DIGITS = re.compile(r"\d+")
+
+def boilerplate_key(line: str) -> str:
+    """Normalize a raw line so repeats differing only in numbers or spacing match"""
+    return _DIGITS.sub('#', ' '.join(line.lower().split()))
+
+class BoilerplateIndex:
+    """
+    Deck-wide frequency index of raw page lines.
+    
+    Lines that appear on at least min_fraction of the indexed pages (course
+    codes, lecturer names, copyright lines, "Slide 3 of 40" counters) are
+    treated as headers/footers. Decks shorter than min_pages have no
+    boilerplate, since a handful of pages cannot tell a footer from a topic.
+    """
+
+    def __init__(self, min_fraction: float = 0.5, min_pages: int = 5):
+        self.min_fraction = min_fraction
+        self.min_pages = min_pages
+        self.page_count = 0
+        self._line_counts: Counter = Counter()
+        self._boilerplate: Set[str] = set()
+
+    def add_pages(self, raw_texts: Iterable[str]) -> None:
+        """Count each distinct line once per page"""
+        for raw_text in raw_texts:
+            self.page_count += 1
+            self._line_counts.update({boilerplate_key(line) for line in raw_text.splitlines()} - {''})
+
+        self._boilerplate = set()
+        if self.page_count >= self.min_pages:
+            min_count = self.min_fraction * self.page_count
+            self._boilerplate = {key for key, count in self._line_counts.items() if count >= min_count}
+
+    @property
+    def boilerplate(self) -> Set[str]:
+        """Normalized lines currently classed as boilerplate"""
+        return self._boilerplate
+
+    def strip(self, raw_text: str) -> str:
+        """
+        Remove boilerplate lines from a page's raw text. Kept lines keep their
+        line breaks, so a page that ended on one still does and its last word
+        stays apart from the next page's first.
+        """
+        if not self._boilerplate:
+            return raw_text
+        return ''.join(line for line in raw_text.splitlines(keepends=True)
+                       if boilerplate_key(line) not in self._boilerplate)
+
+def collapse_builds(texts: List[str]) -> List[int]:
+    """
+    Indices of the pages to keep once animation build-ups are collapsed.
+    
+    A page is dropped when its whole text, with whitespace normalized,
+    reappears as one contiguous run of whole words on the next page (usually
+    as its start), so only the final build of each sequence is kept and no
+    dropped text is missing from the page that replaces it. Pages that merely
+    share words, even in the same order, are kept.
+    """
+    # Padding with spaces makes substring matches line up with word boundaries
+    padded = [f" {' '.join(text.split())} " for text in texts]
+    return [i for i in range(len(texts))
+            if not (padded[i].strip() and i + 1 < len(texts) and padded[i] in padded[i + 1])]
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Lower-cased word n-grams of text; shorter texts give a single shingle"""
+    words = text.lower().split()
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """Jaccard similarity of two shingle sets"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of page shingle sets.
+    
+    Each page is reduced to a one-permutation MinHash signature (every shingle
+    is hashed once and binned) whose bands are bucketed, so a lookup only
+    compares against pages sharing at least one band. Candidates
+    are then confirmed with their exact Jaccard similarity, which keeps the
+    result precise while the total work stays near-linear in the page count.
+    """
+
+    def __init__(self, threshold: float, num_perm: int = 64, seed: int = 1):
+        """
+        Args:
+            threshold: Jaccard similarity at or above which a page counts as a duplicate
+            num_perm: MinHash signature length (number of bins)
+            seed: Hash salt, fixed so runs are reproducible
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.rows = self._rows_for_threshold(threshold, num_perm)
+        self.bands = num_perm // self.rows
+        self._salt = seed.to_bytes(8, 'big')
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(self.bands)]
+        self._shingle_sets: List[Set[str]] = []
+
+    @staticmethod
+    def _rows_for_threshold(threshold: float, num_perm: int) -> int:
+        """
+        Pick rows per band so the LSH cut-off (1/bands) ** (1/rows) sits just
+        below threshold, trading a few extra candidates for recall.
+        """
+        best_rows = 1
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            cutoff = (rows / num_perm) ** (1 / rows)
+            if cutoff <= threshold * 0.9:
+                best_rows = rows
+        return best_rows
+
+    def _signature(self, shingle_set: Set[str]) -> List[int]:
+        num_bins = self.num_perm
+        bins: List[int] = [-1] * num_bins
+        for shingle in shingle_set:
+            h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8, salt=self._salt).digest(), 'big')
+            slot, value = h % num_bins, h // num_bins
+            if bins[slot] < 0 or value < bins[slot]:
+                bins[slot] = value
+
+        # Fill empty bins from the next non-empty one (rotation densification)
+        for slot in range(num_bins):
+            if bins[slot] >= 0:
+                continue
+            for step in range(1, num_bins):
+                value = bins[(slot + step) % num_bins]
+                if value >= 0:
+                    bins[slot] = value + step * (1 << 58)
+                    break
+        return bins
+
+    def add_if_new(self, text: str) -> bool:
+        """
+        Index text unless it is a near-duplicate of an already indexed page.
+        
+        Returns:
+            True if text was new and has been added, False if it is a duplicate
+        """
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return True
+
+        signature = self._signature(shingle_set)
+        band_keys = [tuple(signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+        checked = set()
+        for buckets, key in zip(self._buckets, band_keys):
+            for candidate in buckets.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if jaccard(shingle_set, self._shingle_sets[candidate]) >= self.threshold:
+                    return False
+
+        page_id = len(self._shingle_sets)
+        self._shingle_sets.append(shingle_set)
+        for buckets, key in zip(self._buckets, band_keys):
+            buckets.setdefault(key, []).append(page_id)
+        return True
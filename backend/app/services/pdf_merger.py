@@ -1,98 +1,350 @@
+import asyncio
 import fitz
+import hashlib
 import os
 import re
-from typing import List, Optional, BinaryIO
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 from fastapi import HTTPException
-from ..utils.temp_utils import create_temp_file, get_temp_dir, save_temp_file
+from ..config import config
+from ..utils.file_cache import FileCache
+from ..utils.pdf_utils import PdfSource, open_pdf
+from ..utils.temp_utils import get_temp_file_path
+from ..utils.upload_spool import get_spool, source_sha256, spool_key
 
-def strip_bookmarks(pdf_path: str) -> Optional[fitz.Document]:
-    """Open a PDF, remove bookmarks by creating a new doc with all pages."""
-    try:
-        # Verify file exists and is readable
-        if not os.path.exists(pdf_path):
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-        
-        if not os.access(pdf_path, os.R_OK):
-            raise PermissionError(f"Cannot read PDF file: {pdf_path}")
-        
-        # Check file size
-        file_size = os.path.getsize(pdf_path)
-        if file_size == 0:
-            raise ValueError(f"PDF file is empty: {pdf_path}")
+MERGED_PDF_FILENAME = "merged_lectures.pdf"
+
+# Bump when the merged output changes for the same inputs
+_MERGE_CACHE_VERSION = "1"
+_merge_cache: Optional[FileCache] = None
+
+# Document.tobytes options for each MERGE_OUTPUT_PROFILE, from quickest to save
+# to smallest: garbage=3 merges duplicate objects, garbage=4 also compares
+# stream contents, so fonts and images repeated across lecture files are
+# stored once
+MERGE_OUTPUT_PROFILES: Dict[str, Dict[str, Any]] = {
+    "fast": {},
+    "balanced": {"garbage": 3, "deflate": True},
+    "compact": {"garbage": 4, "deflate": True, "deflate_images": True, "deflate_fonts": True, "clean": True},
+}
+
+def output_options(profile: Optional[str] = None) -> Dict[str, Any]:
+    """tobytes options for profile (defaults to config.MERGE_OUTPUT_PROFILE)"""
+    if profile is None:
+        profile = config.MERGE_OUTPUT_PROFILE
+    if profile not in MERGE_OUTPUT_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown merge output profile '{profile}', "
+                            f"expected one of: {', '.join(MERGE_OUTPUT_PROFILES)}")
+    return MERGE_OUTPUT_PROFILES[profile]
+
+@dataclass
+class MergedPdf:
+    """
+    Handle on a merged PDF passed between the stages of one request.
+    
+    A fresh merge keeps its open document, so extraction in the same request
+    reads it directly; a cache hit points at the stored file instead, and a
+    deferred merge (see defer_merge) only keeps its validated files until the
+    document is needed. Bytes are only produced when to_bytes or save is
+    called, and the first serialization is added to the merge cache. The
+    handle is not shared between requests: call close when done with it.
+    """
+    page_count: int
+    toc: List[List[Any]]
+    doc: Optional[fitz.Document] = None
+    path: Optional[Path] = None
+    profile: str = "fast"
+    cache_key: Optional[str] = None
+    cached: bool = False
+    saved_path: Optional[Path] = None
+    pending_files: Optional[List[Tuple[str, PdfSource, int]]] = None
+    # Spool keys of pending files held until close, so they outlive the request
+    pinned: List[str] = field(default_factory=list)
+
+    @property
+    def source(self) -> PdfSource:
+        """What extraction should open: the live document, or else the stored file"""
+        if self.doc is None and self.path is None:
+            self._assemble()
+        return self.doc if self.doc is not None else self.path
+
+    def _assemble(self) -> None:
+        """Build the document of a deferred merge"""
+        if self.pending_files is None:
+            raise ValueError("Merged PDF was already closed")
+        self.doc, self.toc, self.page_count = assemble_merged_pdf(self.pending_files)
+        self.pending_files = None
+        print(f"Deferred merge assembled: {self.page_count} pages")
+
+    def to_bytes(self) -> bytes:
+        """Serialize the merged PDF with its output profile"""
+        if self.path is not None and self.path.exists():
+            return self.path.read_bytes()
+
+        if self.doc is None:
+            self._assemble()
+        pdf_bytes = self.doc.tobytes(**output_options(self.profile))
+        cache = get_merge_cache()
+        if cache is not None and self.cache_key is not None:
+            self.path = cache.set(self.cache_key, pdf_bytes, {"page_count": self.page_count, "toc": self.toc})
+        return pdf_bytes
+
+    def save(self, filename: str = MERGED_PDF_FILENAME) -> Path:
+        """
+        Write the merged PDF to the temp directory.
         
-        original = fitz.open(pdf_path)
-        cleaned = fitz.open()
-        cleaned.insert_pdf(original)
-        original.close()
-        return cleaned
+        The file is written under a unique name and renamed into place, so
+        concurrent merges never leave a mix of two documents behind.
+        """
+        target = get_temp_file_path(filename)
+        partial_path = target.with_name(f"{target.name}.{uuid.uuid4().hex}.part")
+        try:
+            if self.path is not None and self.path.exists():
+                # Copy a cached merge on disk instead of reading it into memory
+                shutil.copyfile(self.path, partial_path)
+            else:
+                partial_path.write_bytes(self.to_bytes())
+            os.replace(partial_path, target)
+        finally:
+            if partial_path.exists():
+                partial_path.unlink()
+        self.saved_path = target
+        print(f"Merged PDF saved to: {target} ({self.profile} profile, {target.stat().st_size / 1024 / 1024:.1f} MB)")
+        return target
+
+    def close(self) -> None:
+        """Release the open document and any validated files still held"""
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+        self.pending_files = None
+        if self.pinned:
+            spool = get_spool(config.SPOOL_MAX_MB)
+            for key in self.pinned:
+                spool.unpin(key)
+            self.pinned = []
+
+def save_merged_pdf(merged: MergedPdf) -> None:
+    """Save a merge to the temp directory and close it; for background tasks, so errors are only logged"""
+    try:
+        merged.save()
+    except Exception as e:
+        print(f"Error saving merged PDF: {e}")
+    finally:
+        merged.close()
+
+def defer_merge(pdf_files: List[Tuple[str, PdfSource]], validated: List[Tuple[str, PdfSource, int]]) -> MergedPdf:
+    """
+    Describe a merge of already validated files without building it.
+    
+    The TOC and page count follow from the page counts alone; the document
+    is assembled only if the merged PDF is opened or saved, and not at all
+    when the merge cache already holds it. Spooled files are pinned in the
+    spool until the handle is closed, so it can be saved after the request.
+    
+    Args:
+        pdf_files: The uploads in merge order, as submitted (for the cache key)
+        validated: The same uploads as returned by validate_pdfs
+    """
+    profile = config.MERGE_OUTPUT_PROFILE
+    cache_key = merge_cache_key(pdf_files, profile)
+
+    cache = get_merge_cache()
+    entry = cache.get(cache_key) if cache is not None else None
+    if entry is not None:
+        cached_path, metadata = entry
+        return MergedPdf(metadata["page_count"], metadata["toc"], path=cached_path,
+                         profile=profile, cache_key=cache_key, cached=True)
+
+    toc = []
+    page_counter = 0
+    for filename, _, page_count in validated:
+        if page_count > 0:
+            toc.append([1, bookmark_title_from_filename(filename), page_counter + 1])
+            page_counter += page_count
+
+    spool = get_spool(config.SPOOL_MAX_MB)
+    pinned = []
+    for _, content, _ in validated:
+        key = spool_key(content)
+        if key is not None and spool.get(key, pin=True) is not None:
+            pinned.append(key)
+
+    return MergedPdf(page_counter, toc, profile=profile, cache_key=cache_key, pending_files=validated,
+                     pinned=pinned)
+
+def merge_cache_key(pdf_files: List[Tuple[str, PdfSource]], profile: str = "fast") -> str:
+    """Hash of the output profile and the ordered (filename, content hash) list"""
+    digest = hashlib.sha256(f"merge-v{_MERGE_CACHE_VERSION}\n{profile}\n".encode("utf-8"))
+    for filename, content in pdf_files:
+        digest.update(f"{filename}\0{source_sha256(content)}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+def get_merge_cache() -> Optional[FileCache]:
+    """Shared merged-PDF cache, or None when MERGE_CACHE_MB is 0"""
+    global _merge_cache
+    if config.MERGE_CACHE_MB <= 0:
+        return None
+    if _merge_cache is None:
+        _merge_cache = FileCache("merge_cache", config.MERGE_CACHE_MB * 1024 * 1024, ".pdf")
+    _merge_cache.max_bytes = config.MERGE_CACHE_MB * 1024 * 1024
+    return _merge_cache
+
+def open_source(source: PdfSource, name: Optional[str] = None) -> Optional[fitz.Document]:
+    """Open a PDF from memory or disk, or return None if it cannot be read"""
+    if name is None and not isinstance(source, (bytes, bytearray)):
+        name = str(source)
+    try:
+        return open_pdf(source)
     except Exception as e:
-        print(f"Failed to process '{pdf_path}': {e}")
+        print(f"Failed to process '{name or 'in-memory PDF'}': {e}")
         return None
 
-async def merge_pdfs(pdf_files: List[tuple[str, bytes]]) -> bytes:
+def check_pdf(doc: fitz.Document) -> None:
+    """Raise ValueError for an opened upload that cannot be merged"""
+    if doc.needs_pass:
+        raise ValueError("PDF is encrypted")
+
+def validate_pdf(content: PdfSource) -> Tuple[int, Optional[bytes]]:
     """
-    Merge multiple PDF files into a single PDF.
+    Open and check one upload; runs in the merge validation pools.
+    
+    Returns:
+        The page count, and the repaired PDF bytes if MuPDF had to repair the
+        file on open (None otherwise), so assembly does not repair it again
+    """
+    doc = open_pdf(content)
+    try:
+        check_pdf(doc)
+        repaired = doc.tobytes() if doc.is_repaired and doc.page_count else None
+        return doc.page_count, repaired
+    finally:
+        doc.close()
+
+async def validate_pdfs(pdf_files: List[Tuple[str, PdfSource]],
+                        workers: Optional[int] = None) -> List[Tuple[str, PdfSource, int]]:
+    """
+    Validate uploads in parallel, spooled files across a process pool and
+    in-memory ones across a thread pool.
+    
+    Only spooled files' paths are sent to the worker processes, which open
+    them from disk and send back just the page count; in-memory uploads are
+    checked on threads of this process rather than copied to a worker, which
+    overlap because MuPDF releases the GIL while it parses. The first invalid
+    file fails the whole batch immediately and queued files are cancelled
+    rather than waited for. Results come back in input order.
     
     Args:
-        pdf_files: List of tuples containing (filename, file_content)
+        pdf_files: List of tuples containing (filename, file content or spooled file path)
+        workers: Worker processes and threads (defaults to config.MERGE_WORKERS; 1 validates serially)
         
     Returns:
-        bytes: The merged PDF content
+        List of (filename, content to insert, page count) tuples
     """
-    if not pdf_files:
-        raise HTTPException(status_code=400, detail="No PDF files provided")
+    if workers is None:
+        workers = config.MERGE_WORKERS
 
-    # Sort files by name to maintain order
-    pdf_files = sorted(pdf_files, key=lambda x: x[0])
+    def invalid(filename: str, error: BaseException) -> HTTPException:
+        print(f"Error processing file '{filename}': {error}")
+        return HTTPException(status_code=400, detail=f"Error processing file '{filename}': {error}")
+
+    results: List[Tuple[int, Optional[bytes]]] = [(0, None)] * len(pdf_files)
+    in_memory = [i for i, (_, content) in enumerate(pdf_files) if isinstance(content, (bytes, bytearray))]
+    spooled = [i for i in range(len(pdf_files)) if i not in in_memory]
+    pooled = spooled if workers > 1 and len(spooled) > 1 else []
+    threaded = in_memory if workers > 1 and len(in_memory) > 1 else []
+    local = [i for i in range(len(pdf_files)) if i not in pooled and i not in threaded]
+
+    loop = asyncio.get_running_loop()
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(pooled))) if pooled else None
+    thread_executor = ThreadPoolExecutor(max_workers=min(workers, len(threaded))) if threaded else None
+    try:
+        parallel = pooled + threaded
+        futures = ([loop.run_in_executor(executor, validate_pdf, pdf_files[i][1]) for i in pooled] +
+                   [loop.run_in_executor(thread_executor, validate_pdf, pdf_files[i][1]) for i in threaded])
+        for i in local:
+            try:
+                results[i] = validate_pdf(pdf_files[i][1])
+            except Exception as e:
+                raise invalid(pdf_files[i][0], e)
+
+        if futures:
+            done, _ = await asyncio.wait(futures, return_when=asyncio.FIRST_EXCEPTION)
+            for i, future in zip(parallel, futures):
+                if future in done and future.exception() is not None:
+                    raise invalid(pdf_files[i][0], future.exception())
+            for i, future in zip(parallel, futures):
+                results[i] = future.result()
+    finally:
+        # Don't hold the request behind files that no longer matter
+        for pool in (executor, thread_executor):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    return [(filename, repaired or content, page_count)
+            for (filename, content), (page_count, repaired) in zip(pdf_files, results)]
+
+def bookmark_title_from_filename(filename: str) -> str:
+    """Bookmark title for a lecture file, e.g. '03 Trees.pdf' -> '3. Trees'"""
+    bookmark_title = os.path.splitext(filename)[0]
+    match = re.match(r'^(\d+)(.*)', bookmark_title)
+    if match:
+        raw_number, rest = match.groups()
+        rest = rest.lstrip()
+
+        # Always strip leading zeros if the number has more than one digit and starts with zero
+        if len(raw_number) > 1 and raw_number.startswith("0"):
+            number_part = str(int(raw_number))
+        else:
+            number_part = raw_number
+
+        if not rest.startswith('.'):
+            bookmark_title = f"{number_part}. {rest}"
+        else:
+            bookmark_title = number_part + rest
+
+    return bookmark_title
+
+def assemble_merged_pdf(validated: List[Tuple[str, PdfSource, int]]) -> Tuple[fitz.Document, List[List[Any]], int]:
+    """
+    Insert validated uploads into a new document in order and bookmark each one.
     
+    Returns:
+        The merged document (the caller is responsible for closing it), its TOC
+        and its page count
+    """
     merged_doc = fitz.open()
     toc = []
     page_counter = 0
-
-    temp_files = []
     
     try:
-        for filename, file_content in pdf_files:
-            # Create temporary file for processing using local temp directory
-            temp_file_path = create_temp_file(suffix='.pdf', prefix=f"merge_{filename}_")
-            temp_files.append(temp_file_path)
-            
+        for filename, file_content, validated_page_count in validated:
+            if validated_page_count == 0:
+                print(f"Skipping empty PDF: {filename}")
+                continue
+
             try:
-                # Write content to temporary file
-                with open(temp_file_path, 'wb') as temp_file:
-                    temp_file.write(file_content)
-                
-                # Ensure file is fully written and closed before processing
-                cleaned_doc = strip_bookmarks(str(temp_file_path))
+                # Open the upload straight from memory or its spooled file
+                source_doc = open_source(file_content, filename)
                 
-                if cleaned_doc is None or cleaned_doc.page_count == 0:
+                if source_doc is None or source_doc.page_count == 0:
                     print(f"Skipping empty or invalid PDF: {filename}")
+                    if source_doc is not None:
+                        source_doc.close()
                     continue
 
-                merged_doc.insert_pdf(cleaned_doc)
-
-                # Remove leading zeros from the title
-                bookmark_title = os.path.splitext(filename)[0]
-                match = re.match(r'^(\d+)(.*)', bookmark_title)
-                if match:
-                    raw_number, rest = match.groups()
-                    rest = rest.lstrip()
-
-                    # Always strip leading zeros if the number has more than one digit and starts with zero
-                    if len(raw_number) > 1 and raw_number.startswith("0"):
-                        number_part = str(int(raw_number))
-                    else:
-                        number_part = raw_number
-
-                    if not rest.startswith('.'):
-                        bookmark_title = f"{number_part}. {rest}"
-                    else:
-                        bookmark_title = number_part + rest
-
-                toc.append([1, bookmark_title, page_counter + 1])
-                page_counter += cleaned_doc.page_count
+                try:
+                    merged_doc.insert_pdf(source_doc)
+                    page_count = source_doc.page_count
+                finally:
+                    source_doc.close()
 
-                cleaned_doc.close()
+                toc.append([1, bookmark_title_from_filename(filename), page_counter + 1])
+                page_counter += page_count
                 
             except Exception as e:
                 print(f"Error processing file '{filename}': {str(e)}")
@@ -102,21 +354,58 @@ async def merge_pdfs(pdf_files: List[tuple[str, bytes]]) -> bytes:
             raise HTTPException(status_code=400, detail="No valid PDF content found to merge")
 
         merged_doc.set_toc(toc)
-        
-        # Save to bytes
-        pdf_bytes = merged_doc.tobytes()
+        return merged_doc, toc, page_counter
+
+    except Exception:
         merged_doc.close()
+        raise
+
+async def merge_pdfs(pdf_files: List[Tuple[str, PdfSource]]) -> MergedPdf:
+    """
+    Merge multiple PDF files into a single PDF.
+    
+    Merges are cached under a hash of the ordered (filename, content hash)
+    list, so re-submitting the same files returns the stored document and
+    its TOC without validating or merging anything. A fresh merge is returned
+    open and is not serialized here: the caller can extract from it within
+    the request, then save and close it (see MergedPdf).
+    
+    Uploads are first validated in parallel (see validate_pdfs), so an
+    invalid file fails the request before anything is merged; assembly then
+    runs in file order, so bookmarks and page offsets do not depend on which
+    worker finished first. Each upload is opened from memory and its pages
+    are inserted straight into the merged document. insert_pdf does not carry
+    over the source outline, so the only bookmarks in the result are the
+    per-file ones set here. The result is saved with the tobytes options of
+    config.MERGE_OUTPUT_PROFILE.
+    
+    Args:
+        pdf_files: List of tuples containing (filename, file content or spooled file path)
         
-        # Save merged PDF to local temp directory for later use
-        merged_pdf_path = save_temp_file(pdf_bytes, "merged_lectures.pdf")
-        print(f"Merged PDF saved to: {merged_pdf_path}")
-        
-        return pdf_bytes
-        
-    finally:
-        # Clean up temporary files
-        for temp_file_path in temp_files:
-            try:
-                temp_file_path.unlink()
-            except Exception:
-                pass
+    Returns:
+        MergedPdf: Handle on the merged document, with its page count and TOC
+    """
+    if not pdf_files:
+        raise HTTPException(status_code=400, detail="No PDF files provided")
+
+    # Sort files by name to maintain order
+    pdf_files = sorted(pdf_files, key=lambda x: x[0])
+
+    profile = config.MERGE_OUTPUT_PROFILE
+    output_options(profile)
+    cache_key = merge_cache_key(pdf_files, profile)
+
+    cache = get_merge_cache()
+    if cache is not None:
+        entry = cache.get(cache_key)
+        if entry is not None:
+            cached_path, metadata = entry
+            print(f"Merged PDF served from cache: {cached_path}")
+            return MergedPdf(metadata["page_count"], metadata["toc"], path=cached_path,
+                             profile=profile, cache_key=cache_key, cached=True)
+
+    # In-memory uploads are checked during assembly, which opens them anyway
+    validated = await validate_pdfs(pdf_files)
+    merged_doc, toc, page_counter = assemble_merged_pdf(validated)
+    
+    return MergedPdf(page_counter, toc, doc=merged_doc, profile=profile, cache_key=cache_key)
@@ -0,0 +1,171 @@
+"""
+Client-side request and token budgets for OpenAI models.
+
+Every completion reserves one request and its estimated tokens (prompt
+estimate plus max_tokens) from per-model buckets shared by all concurrent
+lectures, so bursts are spread out before the API starts rejecting them.
+"""
+
+import asyncio
+import random
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ..config import config, estimate_tokens, parse_model_limits
+
+# Backoff when a rate limit response carries no usable reset hint
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def model_limits(model: str) -> Tuple[int, int]:
+    """Requests and tokens per minute allowed for a model
+
+    OPENAI_MODEL_LIMITS holds per-model overrides as "model=rpm:tpm" pairs
+    separated by commas; other models use OPENAI_RPM and OPENAI_TPM.
+    """
+    return parse_model_limits(config.OPENAI_MODEL_LIMITS).get(model, (config.OPENAI_RPM, config.OPENAI_TPM))
+
+def estimate_request_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Tokens a completion counts against the TPM budget before it runs"""
+    prompt = sum(estimate_tokens(message.get("content") or "") for message in messages)
+    return prompt + max_tokens
+
+class TokenBucket:
+    """Continuously refilling budget of `capacity` units per minute"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def resize(self, capacity: int):
+        if capacity != self.capacity:
+            self._refill(time.monotonic())
+            self.capacity = capacity
+            self.level = min(self.level, capacity)
+
+    def wait_time(self, amount: int) -> float:
+        """Seconds until `amount` units are available, 0 when they are now"""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(time.monotonic())
+        # A single request larger than the whole budget waits for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.capacity
+
+    def take(self, amount: int):
+        if self.capacity > 0:
+            self.level -= min(amount, self.capacity)
+
+    def give(self, amount: int):
+        if self.capacity > 0:
+            self.level = min(self.capacity, self.level + amount)
+
+class ModelRateLimiter:
+    """RPM and TPM buckets for one model, plus a pause set by 429 responses"""
+
+    def __init__(self, model: str):
+        self.model = model
+        rpm, tpm = model_limits(model)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        """Wait until one request of `tokens` estimated tokens fits the budget"""
+        async with self.lock:
+            rpm, tpm = model_limits(self.model)
+            self.requests.resize(rpm)
+            self.tokens.resize(tpm)
+            while True:
+                wait = max(
+                    self.blocked_until - time.monotonic(),
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens),
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+
+    def settle(self, reserved: int, used: Optional[int]):
+        """Return the unused part of a reservation once actual usage is known (0 for a rejected request)"""
+        if used is not None and used < reserved:
+            self.tokens.give(reserved - used)
+
+    def pause(self, seconds: float):
+        """Hold every caller of this model for `seconds`"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+_limiters: Dict[str, ModelRateLimiter] = {}
+
+def get_rate_limiter(model: str) -> ModelRateLimiter:
+    """Limiter shared by every OpenAIService in this process"""
+    if model not in _limiters:
+        _limiters[model] = ModelRateLimiter(model)
+    return _limiters[model]
+
+def parse_duration(value: str) -> Optional[float]:
+    """Seconds in a reset header such as "20ms", "1.5s", "6m0s" or "30" """
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNITS[unit] for amount, unit in parts)
+
+def retry_after(headers) -> Optional[float]:
+    """
+    Seconds the API asked us to wait, from a rate limit response's headers.
+    
+    An explicit retry-after(-ms) wins. Otherwise only the reset time of a
+    bucket that is actually exhausted (x-ratelimit-remaining-* of 0) counts:
+    the other bucket's reset says nothing about why the request failed.
+    """
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if headers.get("retry-after"):
+        seconds = parse_duration(headers["retry-after"])
+        if seconds is not None:
+            return seconds
+    waits = []
+    for bucket in ("requests", "tokens"):
+        remaining = headers.get(f"x-ratelimit-remaining-{bucket}")
+        reset = headers.get(f"x-ratelimit-reset-{bucket}")
+        if remaining is not None and remaining.strip() == "0" and reset:
+            seconds = parse_duration(reset)
+            if seconds is not None:
+                waits.append(seconds)
+    return max(waits) if waits else None
+
+def backoff_delay(attempt: int, hint: Optional[float] = None) -> float:
+    """Jittered wait before retry `attempt` (1-based)
+
+    A server hint is used as the floor with a little jitter on top so that
+    callers released together do not retry together; without one, a random
+    point in the upper half of an exponentially growing window.
+    """
+    if hint is not None:
+        return hint + random.uniform(0, min(hint, BACKOFF_BASE) * 0.5 + 0.1)
+    window = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+    return random.uniform(window / 2, window)
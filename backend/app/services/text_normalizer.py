@@ -0,0 +1,238 @@
+"""
+Text normalization for extracted PDF pages.
+
+Everything here is plain string processing, so it can be used (and tested)
+without PyMuPDF. Patterns and replacement tables are built once at import
+time because these functions run for every page of every upload.
+"""
+
+import re
+from collections import deque
+from typing import Dict, Iterator, List, Tuple
+
+# A kept line must contain at least three consecutive ASCII letters
+_THREE_LETTERS = re.compile(r'[A-Za-z]{3}')
+
+# Characters str.splitlines() treats as line boundaries
+_LINE_BREAKS = frozenset('\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029')
+
+# Unicode punctuation and its ASCII equivalent. Chained str.replace calls beat
+# str.translate here: translate falls off its fast path for non-ASCII text.
+_UNICODE_REPLACEMENTS = (
+    ('\u2018', "'"), ('\u2019', "'"), ('\u201a', "'"), ('\u201b', "'"),
+    ('\u2014', '-'), ('\u2013', '-'), ('\u2212', '-'),
+    ('\u2026', '...'),
+    ('\u202f', ' '), ('\xa0', ' '),
+    ('\u2032', "'"),
+    ('\u2039', '<'), ('\u203a', '>'),
+)
+
+_DUPLICATE_PERIODS = re.compile(r'\.\s+\.')
+
+def extract_clean_paragraphs(text: str) -> str:
+    """Extract and clean paragraphs from text"""
+    # Lines with three letters can never be bare page numbers or shorter than
+    # three characters, so the letter check is the only per-line filter needed.
+    # str.split() collapses whitespace exactly like re.sub(r'\s+', ' ', ...).
+    search = _THREE_LETTERS.search
+    kept_lines = ' '.join(line for line in text.splitlines() if search(line))
+    return ' '.join(kept_lines.split())
+
+def join_cleaned_pages(pages: List[Tuple[str, str]]) -> str:
+    """
+    Clean the concatenation of several pages from their cached cleaned text.
+    
+    Args:
+        pages: (raw_text, cleaned_text) pairs, cleaned_text being
+            extract_clean_paragraphs(raw_text)
+        
+    Returns:
+        The same string as extract_clean_paragraphs(''.join(raw pages))
+    """
+    # Pages normally end on a line break, so no line spans two pages and the
+    # per-page results can be joined; otherwise clean the concatenation
+    if all(not raw or raw[-1] in _LINE_BREAKS for raw, _ in pages[:-1]):
+        return ' '.join(cleaned for _, cleaned in pages if cleaned)
+    return extract_clean_paragraphs(''.join(raw for raw, _ in pages))
+
+def replace_unicode(text: str) -> str:
+    """Replace Unicode punctuation with ASCII equivalents"""
+    if text.isascii():
+        return text
+    for uni_char, ascii_char in _UNICODE_REPLACEMENTS:
+        text = text.replace(uni_char, ascii_char)
+    return text
+
+class TitleMatcher:
+    """
+    Aho-Corasick automaton over the letters of several titles.
+    
+    Titles are matched case-insensitively on their letters only, so spacing,
+    punctuation and digits in either the title or the content are ignored.
+    """
+
+    def __init__(self, titles: List[str]):
+        self.patterns = [[c for c in title.lower() if c.isalpha()] for title in titles]
+
+        # Trie of the letter sequences; node 0 is the root
+        self.goto: List[Dict[str, int]] = [{}]
+        self.output: List[List[int]] = [[]]
+        for pattern_id, letters in enumerate(self.patterns):
+            if not letters:
+                continue
+            node = 0
+            for letter in letters:
+                if letter not in self.goto[node]:
+                    self.goto.append({})
+                    self.output.append([])
+                    self.goto[node][letter] = len(self.goto) - 1
+                node = self.goto[node][letter]
+            self.output[node].append(pattern_id)
+
+        # Breadth-first failure links, merging outputs of each node's suffixes
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for letter, child in self.goto[node].items():
+                fallback = self.fail[node]
+                while fallback and letter not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(letter, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+                queue.append(child)
+
+    def first_match_ends(self, content: str) -> Dict[int, int]:
+        """Map each matched title index to the content index just after its first match"""
+        goto, fail, output = self.goto, self.fail, self.output
+        remaining = sum(1 for letters in self.patterns if letters)
+        ends = {}
+        node = 0
+
+        for i, c in enumerate(content):
+            if not remaining:
+                break
+            if not c.isalpha():
+                continue
+            letter = c.lower()
+            while node and letter not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(letter, 0)
+            for pattern_id in output[node]:
+                if pattern_id not in ends:
+                    ends[pattern_id] = i + 1
+                    remaining -= 1
+
+        return ends
+
+def insert_periods_after_titles(titles: List[str], content: str) -> str:
+    """Insert a period after the first match of each title in content, in one pass"""
+    positions = sorted(set(TitleMatcher(titles).first_match_ends(content).values()))
+
+    parts = []
+    last = 0
+    for position in positions:
+        if position < len(content) and content[position] != '.':
+            parts.append(content[last:position])
+            parts.append('.')
+            last = position
+    parts.append(content[last:])
+    return ''.join(parts)
+
+def insert_period_after_title_match(title: str, content: str) -> str:
+    """Insert period after title match in content"""
+    return insert_periods_after_titles([title], content)
+
+# A capital/symbol on a word boundary, extended over the rest of its run of
+# capitals/symbols joined by single whitespace characters. Capitals/symbols and
+# whitespace never overlap and nothing follows the run, so it cannot backtrack.
+_CAPITAL_RUN = re.compile(r"\b(?:[A-Z]|[^\w\s.])(?:[A-Z]|[^\w\s.])*(?:\s(?:[A-Z]|[^\w\s.])+)*\s?")
+_NON_ALNUM = re.compile(r'[^A-Za-z0-9]')
+
+def _is_word_char(c: str) -> bool:
+    """Check for a word character, as matched by \\w in str patterns"""
+    return c.isalnum() or c == '_'
+
+def find_capital_blocks(text: str) -> Iterator[Tuple[int, int]]:
+    r"""
+    Yield the (start, end) spans of capital letter/symbol blocks in text.
+    
+    Produces the same spans as re.finditer(r"\b(?:(?:[A-Z]|[^\w\s.])+\s?)+\b"),
+    whose nested quantifiers backtrack exponentially on long runs of capitals
+    and symbols, in time linear in len(text).
+    """
+    text_length = len(text)
+
+    for run in _CAPITAL_RUN.finditer(text):
+        start, run_end = run.span()
+
+        # The block can end anywhere in the run; the greedy pattern keeps the
+        # last word boundary. Later starts in the same run would have to end
+        # after that boundary too, so each run holds at most one block.
+        next_is_word = run_end < text_length and _is_word_char(text[run_end])
+        for end in range(run_end, start, -1):
+            is_word = _is_word_char(text[end - 1])
+            if is_word != next_is_word:
+                yield start, end
+                break
+            next_is_word = is_word
+
+def remove_capital(text: str, min_length=4) -> str:
+    """Remove capital letter blocks and replace with formatted text"""
+    result = []
+    last_end = 0
+
+    for start, end in find_capital_blocks(text):
+        block = text[start:end].strip()
+        words = block.split()
+
+        # Ignore if it's a single character that's a letter (symbols count as part of blocks)
+        if len(words) == 1 and len(words[0]) == 1 and words[0].isalpha():
+            continue
+
+        # Check for trailing single character (letters or symbols except period)
+        has_trailing_single = (len(words) >= 2 and len(words[-1]) == 1 
+                              and words[-1] != '.')
+
+        core_words = words[:-1] if has_trailing_single else words
+        core_block = ' '.join(core_words)
+
+        # Skip blocks that don't meet min length (excluding spaces and non-letter chars)
+        if len(_NON_ALNUM.sub('', core_block)) <= min_length:
+            continue
+
+        # Build the replacement block
+        replacement = core_block + '.'
+        if has_trailing_single:
+            replacement += ' ' + words[-1]
+
+        # Check the char after the match
+        char_after = text[end] if end < len(text) else ''
+        if char_after == '.':
+            replacement = replacement.rstrip('.')
+
+        # Add space if needed
+        if end >= len(text) or text[end] not in [' ', '.']:
+            replacement += ' '
+
+        # Append unchanged text + replacement
+        result.append(text[last_end:start])
+        result.append(replacement)
+        last_end = end
+
+    # Append remaining text
+    result.append(text[last_end:])
+    return ''.join(result)
+
+def normalize_text(text: str) -> str:
+    """Normalize text by replacing Unicode characters and cleaning format"""
+    # Replace Unicode punctuation with ASCII equivalents
+    text = replace_unicode(text)
+
+    # Remove duplicate periods
+    text = _DUPLICATE_PERIODS.sub('.', text)
+
+    # Match full all-caps block followed by a capitalized word
+    text = remove_capital(text)
+
+    return text
@@ -0,0 +1,225 @@
+"""
+Resumable chunked uploads that finish in the upload spool.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+import weakref
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..config import config
+from ..utils.temp_utils import get_temp_dir
+from ..utils.upload_spool import CHUNK_SIZE, UploadSpool, get_spool
+
+UPLOADS_DIRNAME = "uploads"
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# One lock per upload being written to, dropped once no request holds it
+_upload_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def _upload_paths(upload_id: str) -> Tuple[Path, Path]:
+    """Partial data and session file of an upload"""
+    if not _UPLOAD_ID.match(upload_id):
+        raise HTTPException(status_code=404, detail=f"Upload '{upload_id}' not found")
+    uploads_dir = get_temp_dir() / UPLOADS_DIRNAME
+    return uploads_dir / f"{upload_id}.part", uploads_dir / f"{upload_id}.json"
+
+def _upload_lock(upload_id: str) -> asyncio.Lock:
+    """
+    Lock serializing the requests that change an upload. Requests are only
+    serialized within this process, so resumable uploads need a single worker.
+    """
+    lock = _upload_locks.get(upload_id)
+    if lock is None:
+        lock = _upload_locks[upload_id] = asyncio.Lock()
+    return lock
+
+def _save_session(session: Dict[str, Any]) -> None:
+    """Write the session file under a unique name and rename it into place, so readers never see half of it"""
+    _, session_path = _upload_paths(session["upload_id"])
+    partial_path = session_path.with_name(f"{session_path.name}.{uuid.uuid4().hex}.part")
+    try:
+        partial_path.write_text(json.dumps(session), encoding="utf-8")
+        os.replace(partial_path, session_path)
+    finally:
+        if partial_path.exists():
+            partial_path.unlink()
+
+def expire_uploads() -> int:
+    """
+    Delete unfinished uploads that received nothing for config.UPLOAD_TTL_HOURS,
+    and the sessions of uploads finalized longer ago than that (their content
+    stays in the spool). Uploads with a request in progress are left alone.
+    
+    Returns:
+        Number of uploads deleted
+    """
+    if config.UPLOAD_TTL_HOURS <= 0:
+        return 0
+    uploads_dir = get_temp_dir() / UPLOADS_DIRNAME
+    cutoff = time.time() - config.UPLOAD_TTL_HOURS * 3600
+    expired = 0
+    for session_path in uploads_dir.glob("*.json"):
+        upload_id = session_path.stem
+        lock = _upload_locks.get(upload_id)
+        if not _UPLOAD_ID.match(upload_id) or (lock is not None and lock.locked()):
+            continue
+        data_path, _ = _upload_paths(upload_id)
+        try:
+            session = json.loads(session_path.read_text(encoding="utf-8"))
+            if session["finalized"]:
+                # The session file was last written when it was finalized
+                last_activity = session_path.stat().st_mtime
+            else:
+                last_activity = max(session["created"], data_path.stat().st_mtime if data_path.exists() else 0)
+        except (OSError, ValueError, KeyError):
+            continue
+        if last_activity >= cutoff:
+            continue
+        for path in (data_path, session_path):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        expired += 1
+    return expired
+
+def get_upload(upload_id: str) -> Dict[str, Any]:
+    """
+    Current state of an upload. The offset is the size of the data received
+    so far, so a client can resume from it after a dropped connection.
+    """
+    data_path, session_path = _upload_paths(upload_id)
+    try:
+        session = json.loads(session_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        raise HTTPException(status_code=404, detail=f"Upload '{upload_id}' not found")
+    
+    if not session["finalized"]:
+        session["offset"] = data_path.stat().st_size if data_path.exists() else 0
+    return session
+
+def create_upload(filename: str, size: Optional[int] = None) -> Dict[str, Any]:
+    """Start an upload of filename, optionally declaring its total size in bytes"""
+    if not filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail=f"File {filename} is not a PDF")
+    
+    # Abandoned uploads would otherwise keep their partial data forever
+    expired = expire_uploads()
+    if expired:
+        print(f"Expired {expired} unfinished uploads")
+    
+    upload_id = uuid.uuid4().hex
+    data_path, _ = _upload_paths(upload_id)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+    data_path.touch()
+    
+    session = {
+        "upload_id": upload_id,
+        "filename": filename,
+        "size": size,
+        "offset": 0,
+        "finalized": False,
+        "sha256": None,
+        "created": time.time(),
+    }
+    _save_session(session)
+    return session
+
+async def append_chunk(upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """
+    Append a chunk at offset, streaming it straight to the upload's data file.
+    
+    The offset must equal the bytes received so far; a mismatch is rejected
+    with 409 so the client can re-read the offset and resume from there.
+    Chunks for the same upload are written one request at a time, so two
+    retries of one chunk cannot both pass the offset check.
+    """
+    async with _upload_lock(upload_id):
+        session = get_upload(upload_id)
+        if session["finalized"]:
+            raise HTTPException(status_code=409, detail=f"Upload '{upload_id}' is already finalized")
+        if offset != session["offset"]:
+            raise HTTPException(status_code=409, detail=f"Offset {offset} does not match the {session['offset']} bytes received")
+        
+        data_path, _ = _upload_paths(upload_id)
+        received = offset
+        with open(data_path, 'ab') as f:
+            async for chunk in chunks:
+                received += len(chunk)
+                if session["size"] is not None and received > session["size"]:
+                    f.truncate(offset)
+                    raise HTTPException(status_code=400, detail=f"Chunk exceeds the declared size of {session['size']} bytes")
+                f.write(chunk)
+        
+        session["offset"] = received
+        return session
+
+async def finalize_upload(upload_id: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Move a complete upload into the spool, where merge and extract can use it.
+    
+    The data file is renamed into place, not copied. If sha256 is given, it
+    must match the received content. Waits for a chunk still being written.
+    A finalized upload stays in the spool until evicted to keep it under
+    SPOOL_MAX_MB; resolve_uploads then reports it with 410. Its session is
+    deleted UPLOAD_TTL_HOURS after finalizing, after which the ID is unknown.
+    """
+    async with _upload_lock(upload_id):
+        # Hashing reads the whole file, so it runs off the event loop
+        return await asyncio.to_thread(_finalize_upload, upload_id, sha256)
+
+def _finalize_upload(upload_id: str, sha256: Optional[str]) -> Dict[str, Any]:
+    session = get_upload(upload_id)
+    if session["finalized"]:
+        return session
+    
+    data_path, _ = _upload_paths(upload_id)
+    if session["size"] is not None and session["offset"] != session["size"]:
+        raise HTTPException(status_code=400, detail=f"Upload is incomplete: {session['offset']} of {session['size']} bytes received")
+    if session["offset"] == 0:
+        raise HTTPException(status_code=400, detail="Upload is empty")
+    
+    digest = hashlib.sha256()
+    with open(data_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    content_sha256 = digest.hexdigest()
+    if sha256 is not None and sha256.lower() != content_sha256:
+        raise HTTPException(status_code=400, detail="Upload content does not match the given sha256")
+    
+    spool = get_spool(config.SPOOL_MAX_MB)
+    if spool.get(content_sha256) is not None:
+        os.remove(data_path)
+    else:
+        spool.set(content_sha256, data_path, {"filename": session["filename"]}, move=True)
+    
+    session.update(finalized=True, sha256=content_sha256, size=session["offset"])
+    _save_session(session)
+    return session
+
+def resolve_uploads(upload_ids: List[str], spool: UploadSpool) -> List[Tuple[str, Path]]:
+    """
+    (filename, spooled path) of finalized uploads, for the merge and extract
+    endpoints. The files are pinned in the request's spool until it releases
+    them; one already evicted to stay under SPOOL_MAX_MB is reported with 410.
+    """
+    pdf_files = []
+    for upload_id in upload_ids:
+        session = get_upload(upload_id)
+        if not session["finalized"]:
+            raise HTTPException(status_code=409, detail=f"Upload '{upload_id}' is not finalized")
+        spooled_path = spool.get(session["sha256"])
+        if spooled_path is None:
+            raise HTTPException(status_code=410, detail=f"Upload '{upload_id}' has expired from the spool")
+        pdf_files.append((session["filename"], spooled_path))
+    return pdf_files
@@ -0,0 +1,123 @@
+"""
+Content-addressed cache of files plus JSON metadata under the project temp directory.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+from .temp_utils import get_temp_dir
+
+class FileCache:
+    """
+    Directory of <key><suffix> files with <key>.json metadata, evicted least
+    recently used first once their total size exceeds a disk quota.
+    
+    File modification times record use, so the cache needs no index and
+    survives restarts. Entries pinned by get or set are never evicted until
+    they are unpinned; pins are counted per key and held by this process only.
+    """
+
+    def __init__(self, dirname: Union[str, Path], max_bytes: int, suffix: str = ".bin"):
+        """
+        Args:
+            dirname: Directory name inside the temp directory, or a full path
+            max_bytes: Disk quota for stored files and metadata
+            suffix: File extension of the stored files (e.g. '.pdf')
+        """
+        path = Path(dirname)
+        self.path = path if path.is_absolute() else get_temp_dir() / path
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._pins: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return self.path / f"{key}{self.suffix}", self.path / f"{key}.json"
+
+    def get(self, key: str, pin: bool = False) -> Optional[Tuple[Path, Dict[str, Any]]]:
+        """Return the stored file's path and its metadata, or None. With pin, a hit is also pinned"""
+        file_path, meta_path = self._paths(key)
+        with self._lock:
+            try:
+                metadata = json.loads(meta_path.read_text(encoding="utf-8"))
+                now = time.time()
+                os.utime(file_path, (now, now))
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if pin:
+                self._pins[key] = self._pins.get(key, 0) + 1
+        return file_path, metadata
+
+    def set(self, key: str, content: Union[bytes, Path], metadata: Dict[str, Any], move: bool = False,
+            pin: bool = False) -> Path:
+        """
+        Store content (bytes, or an existing file to copy) with its metadata.
+        
+        The file is written before the metadata, so get never returns a
+        partially written entry. With move, an existing file on the same file
+        system is renamed into the cache instead of copied. With pin, the new
+        entry is pinned before other entries are evicted.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        file_path, meta_path = self._paths(key)
+        partial_path = file_path.with_name(file_path.name + ".part")
+
+        if isinstance(content, (bytes, bytearray)):
+            partial_path.write_bytes(content)
+        elif move:
+            partial_path = Path(content)
+        else:
+            shutil.copyfile(content, partial_path)
+        os.replace(partial_path, file_path)
+        meta_path.write_text(json.dumps(metadata, ensure_ascii=False), encoding="utf-8")
+
+        with self._lock:
+            if pin:
+                self._pins[key] = self._pins.get(key, 0) + 1
+            self._evict(keep=key)
+        return file_path
+
+    def unpin(self, key: str) -> None:
+        """Release one pin taken by get or set, letting the entry be evicted once none remain"""
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Remove least recently used unpinned entries until the quota is met (called under the lock)"""
+        entries = []
+        total = 0
+        for file_path in self.path.glob(f"*{self.suffix}"):
+            key = file_path.name[:-len(self.suffix)]
+            meta_path = self.path / f"{key}.json"
+            try:
+                size = file_path.stat().st_size + (meta_path.stat().st_size if meta_path.exists() else 0)
+                entries.append((file_path.stat().st_mtime, key, size))
+            except OSError:
+                continue
+            total += size
+
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep or key in self._pins:
+                continue
+            for path in self._paths(key):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            total -= size
@@ -0,0 +1,40 @@
+"""
+Process memory reporting for the memory-bounded extraction mode.
+"""
+
+import sys
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident set size of this process in MB, or None where unsupported.
+    
+    Low-memory extraction runs in-process, so worker processes are not counted.
+    """
+    if resource is None:
+        return None
+    
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return peak / scale
+
+def peak_rss_report(baseline: Optional[float]) -> str:
+    """
+    Log line for the process peak RSS and its growth since baseline, a
+    peak_rss_mb reading taken when the measured work started.
+    
+    The peak covers the process lifetime, so in a long-running server it may
+    predate the work; the growth is what the work added on top of it.
+    """
+    peak = peak_rss_mb()
+    if peak is None:
+        return "Process peak RSS: unavailable on this platform"
+    growth = peak - baseline if baseline is not None else 0.0
+    return f"Process peak RSS: {peak:.1f} MB (+{growth:.1f} MB during this extraction)"
@@ -0,0 +1,68 @@
+"""
+PDF document helpers for opening documents without temp-file round trips.
+"""
+
+from pathlib import Path
+from typing import Optional, Union
+
+import fitz
+
+# Anything open_pdf accepts: an in-memory buffer, the path of an existing file,
+# or a document that is already open
+PdfSource = Union[bytes, bytearray, str, Path, fitz.Document]
+
+def open_pdf(source: PdfSource) -> fitz.Document:
+    """
+    Open a PDF directly from memory or from an existing file.
+    
+    Buffers are handed to MuPDF as a stream, so uploaded bytes never have to be
+    written to disk first. Paths are opened in place and MuPDF reads pages from
+    the file on demand instead of loading a Python copy of it. An open
+    document is returned as is and stays owned by whoever opened it.
+    
+    Args:
+        source: PDF content as bytes/bytearray, the path of a PDF file, or an open fitz.Document
+        
+    Returns:
+        The opened fitz.Document (the caller is responsible for closing it,
+        unless source was already open)
+    """
+    if isinstance(source, fitz.Document):
+        if source.is_closed:
+            raise ValueError("PDF document is closed")
+        return source
+    if isinstance(source, (bytes, bytearray)):
+        if not source:
+            raise ValueError("PDF content is empty")
+        return fitz.open(stream=source, filetype="pdf")
+    
+    path = Path(source)
+    if not path.exists():
+        raise FileNotFoundError(f"PDF file not found: {path}")
+    if path.stat().st_size == 0:
+        raise ValueError(f"PDF file is empty: {path}")
+    return fitz.open(str(path))
+
+def _mupdf_store_size() -> Optional[int]:
+    """Bytes in MuPDF's resource store, None when this PyMuPDF cannot tell"""
+    size = fitz.TOOLS.store_size
+    # A property in older PyMuPDF releases, a method in newer ones
+    if callable(size):
+        size = size()
+    return size if isinstance(size, int) else None
+
+def trim_mupdf_store(max_mb: int) -> int:
+    """
+    Empty MuPDF's shared resource store (fonts, images, parsed objects) once it
+    grows past max_mb, so long documents do not accumulate cached resources.
+    When the store size is not reported it is emptied unconditionally.
+    
+    Returns:
+        Bytes freed (0 when unknown)
+    """
+    size = _mupdf_store_size()
+    if size is not None and size <= max_mb * 1024 * 1024:
+        return 0
+    fitz.TOOLS.store_shrink(100)
+    after = _mupdf_store_size()
+    return size - after if size is not None and after is not None else 0
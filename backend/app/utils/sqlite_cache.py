@@ -0,0 +1,125 @@
+"""
+Persistent key/value cache stored in SQLite under the project temp directory.
+"""
+
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+from .temp_utils import get_temp_dir
+
+class SqliteCache:
+    """
+    String key/value store with size-based LRU eviction and optional expiry.
+    
+    Each operation opens its own short-lived connection, so one instance can be
+    shared by request handlers and threads. Hit and miss counters are kept per
+    instance for reporting.
+    """
+
+    def __init__(self, filename: Union[str, Path], max_bytes: int, ttl: Optional[float] = None):
+        """
+        Args:
+            filename: Database file name inside the temp directory, or a full path
+            max_bytes: Total size of stored values above which the least
+                recently used entries are evicted
+            ttl: Seconds after being stored that an entry expires, or None to
+                keep entries until evicted for size
+        """
+        path = Path(filename)
+        self.path = path if path.is_absolute() else get_temp_dir() / path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL, created REAL NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            # Databases created before expiry support lack the creation time
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+            if "created" not in columns:
+                conn.execute("ALTER TABLE entries ADD COLUMN created REAL NOT NULL DEFAULT 0")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path), timeout=30)
+
+    def _expiry_cutoff(self) -> float:
+        """Creation time before which entries have expired"""
+        return time.time() - self.ttl if self.ttl else 0.0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the value stored under key, or None"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Return the stored values for whichever of keys are present"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+
+        cutoff = self._expiry_cutoff()
+
+        with closing(self._connect()) as conn, conn:
+            # Stay below SQLite's limit on bound parameters
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({placeholders}) AND created >= ?",
+                    batch + [cutoff]
+                ).fetchall()
+                found.update(rows)
+                if rows:
+                    conn.executemany(
+                        "UPDATE entries SET last_used = ? WHERE key = ?",
+                        [(time.time(), key) for key, _ in rows]
+                    )
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key: str, value: str) -> None:
+        """Store value under key"""
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, str]) -> None:
+        """Store several values, then evict old entries if over the size limit"""
+        if not items:
+            return
+        now = time.time()
+
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used, created) VALUES (?, ?, ?, ?, ?)",
+                [(key, value, len(value.encode("utf-8")), now, now) for key, value in items.items()]
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Delete expired entries, then least recently used ones until the total size fits max_bytes"""
+        if self.ttl:
+            conn.execute("DELETE FROM entries WHERE created < ?", (self._expiry_cutoff(),))
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters of this instance"""
+        return {"hits": self.hits, "misses": self.misses}
@@ -6,7 +6,7 @@ import os
 import uuid
 import shutil
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Iterable, Iterator, Optional, Union
 from contextlib import contextmanager
 
 # Define the project temp directory
@@ -78,6 +78,87 @@ def save_temp_json(data: dict, filename: str) -> Path:
     
     return file_path
 
+def save_temp_json_items(items: Iterable[Any], filename: str) -> Path:
+    """
+    Save an iterable as a JSON list, writing each item as soon as it arrives.
+    
+    The output matches save_temp_json on the equivalent list, but only one item
+    is held at a time. Items go to a partial file that replaces filename once
+    the iterable is exhausted, so readers never see a truncated list.
+    
+    Args:
+        items: Items to save, e.g. a generator of extracted lectures
+        filename: Desired filename
+        
+    Returns:
+        Path to the saved JSON file
+    """
+    import json
+    temp_dir = get_temp_dir()
+    file_path = temp_dir / filename
+    partial_path = temp_dir / f"{filename}.part"
+    
+    try:
+        with open(partial_path, 'w', encoding='utf-8') as f:
+            separator = "[\n"
+            for item in items:
+                item_json = json.dumps(item, indent=2, ensure_ascii=False)
+                f.write(separator + "  " + item_json.replace("\n", "\n  "))
+                separator = ",\n"
+            f.write("[]" if separator == "[\n" else "\n]")
+        os.replace(partial_path, file_path)
+    finally:
+        if partial_path.exists():
+            partial_path.unlink()
+    
+    return file_path
+
+def iter_temp_json_items(file_path: Union[str, Path]) -> Iterator[Any]:
+    """
+    Read a JSON list written by save_temp_json_items (or save_temp_json) back
+    one item at a time, without loading the whole file.
+    
+    Items start at an indent of two spaces and json.dumps never puts a raw
+    newline inside a string, so an item is complete once a line at that
+    indent makes the collected lines parse.
+    """
+    import json
+    with open(file_path, 'r', encoding='utf-8') as f:
+        item_lines = []
+        for line in f:
+            if not item_lines and line.strip() in ("[", "]", "[]", ""):
+                continue
+            item_lines.append(line)
+            if line.startswith("  ") and not line.startswith("   "):
+                try:
+                    item = json.loads("".join(item_lines).rstrip().rstrip(","))
+                except ValueError:
+                    continue
+                item_lines = []
+                yield item
+
+class SavedJsonItems:
+    """
+    A JSON list saved in the temp directory and read back lazily.
+    
+    Iterating reads the items from disk one at a time, so a caller can go
+    through a large list without holding it; delete removes the file.
+    """
+
+    def __init__(self, file_path: Path, count: int):
+        self.path = file_path
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter_temp_json_items(self.path)
+
+    def delete(self) -> None:
+        if self.path.exists():
+            self.path.unlink()
+
 def save_temp_markdown(content: str, filename: str) -> Path:
     """
     Save markdown content to a temporary file in the project temp directory.
@@ -0,0 +1,140 @@
+"""
+Chunked spooling of uploaded PDFs under a per-request memory ceiling.
+"""
+
+import hashlib
+import re
+import uuid
+from pathlib import Path
+from typing import List, Optional, Union
+
+from fastapi import UploadFile
+
+from .file_cache import FileCache
+from .pdf_utils import PdfSource
+from .temp_utils import get_temp_dir
+
+CHUNK_SIZE = 1024 * 1024
+SPOOL_DIRNAME = "spool"
+
+_SHA256_NAME = re.compile(r"^[0-9a-f]{64}$")
+_spool_cache: Optional[FileCache] = None
+
+def get_spool(max_mb: int) -> FileCache:
+    """Content-addressed store of spooled uploads, named <sha256>.pdf"""
+    global _spool_cache
+    if _spool_cache is None:
+        _spool_cache = FileCache(SPOOL_DIRNAME, max_mb * 1024 * 1024, ".pdf")
+    _spool_cache.max_bytes = max_mb * 1024 * 1024
+    return _spool_cache
+
+def spool_key(source: PdfSource) -> Optional[str]:
+    """Spool key (content sha256) of a spooled file, None for any other source"""
+    if isinstance(source, (bytes, bytearray)):
+        return None
+    path = Path(source)
+    if path.parent == get_temp_dir() / SPOOL_DIRNAME and _SHA256_NAME.match(path.stem):
+        return path.stem
+    return None
+
+def source_sha256(source: PdfSource) -> str:
+    """
+    sha256 of a PDF's content. Spooled files are named by their hash, so they
+    are not read again.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    
+    key = spool_key(source)
+    if key is not None:
+        return key
+    
+    path = Path(source)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class UploadSpool:
+    """
+    Reads the uploads of one request in fixed-size chunks.
+    
+    Uploads are kept in memory while the request's total stays within
+    memory_limit bytes; past that, each upload is streamed to the spool area
+    and handed on as a path, so PyMuPDF reads it from disk on demand. The
+    content hash is computed while reading, and identical spooled uploads
+    share one file. Spooled files this request uses stay pinned in the spool,
+    safe from eviction by other requests, until release is called.
+    """
+
+    def __init__(self, memory_limit: int, spool_max_mb: int):
+        """
+        Args:
+            memory_limit: Bytes of upload content this request may hold in memory
+            spool_max_mb: Disk quota of the spool area (least recently used files are evicted)
+        """
+        self.memory_limit = memory_limit
+        self.memory_used = 0
+        self.spool = get_spool(spool_max_mb)
+        self.pinned: List[str] = []
+
+    def get(self, key: str) -> Optional[Path]:
+        """Path of the spooled file with sha256 key, pinned for this request, or None if it was evicted"""
+        entry = self.spool.get(key, pin=True)
+        if entry is None:
+            return None
+        self.pinned.append(key)
+        return entry[0]
+
+    def release(self) -> None:
+        """Unpin the spooled files of this request once it is done with them"""
+        for key in self.pinned:
+            self.spool.unpin(key)
+        self.pinned = []
+
+    async def add(self, file: UploadFile) -> Union[bytes, Path]:
+        """Read one upload, returning its bytes or the path of its spooled copy"""
+        digest = hashlib.sha256()
+        buffer = bytearray()
+        spool_file = None
+        partial_path = None
+        
+        try:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                
+                if spool_file is None and self.memory_used + len(buffer) + len(chunk) <= self.memory_limit:
+                    buffer += chunk
+                    continue
+                
+                if spool_file is None:
+                    # Over the ceiling: move what was buffered to disk and stream the rest
+                    self.spool.path.mkdir(parents=True, exist_ok=True)
+                    partial_path = self.spool.path / f"{uuid.uuid4().hex}.part"
+                    spool_file = open(partial_path, 'wb')
+                    spool_file.write(buffer)
+                    buffer = bytearray()
+                spool_file.write(chunk)
+        except BaseException:
+            if spool_file is not None:
+                spool_file.close()
+                partial_path.unlink()
+            raise
+        
+        if spool_file is None:
+            self.memory_used += len(buffer)
+            return bytes(buffer)
+        
+        spool_file.close()
+        key = digest.hexdigest()
+        spooled_path = self.get(key)
+        if spooled_path is not None:
+            partial_path.unlink()
+            return spooled_path
+        spooled_path = self.spool.set(key, partial_path, {"filename": file.filename}, move=True, pin=True)
+        self.pinned.append(key)
+        return spooled_path
@@ -7,7 +7,7 @@ import sys
 # Add the parent directory to the path so we can import from app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.routers import lectures
+from app.routers import lectures, uploads
 from app.utils.temp_utils import get_temp_dir
 from app.utils.output_utils import get_outputs_dir
 
@@ -34,6 +34,7 @@ app.add_middleware(
 
 # Include routers
 app.include_router(lectures.router, prefix="/api/v1", tags=["lectures"])
+app.include_router(uploads.router, prefix="/api/v1", tags=["uploads"])
 
 @app.get("/")
 async def root():
@@ -45,11 +46,15 @@ async def root():
         "endpoints": {
             "merge_pdfs": "/api/v1/merge-pdfs",
             "extract_content": "/api/v1/extract-content", 
+            "extract_content_stream": "/api/v1/extract-content-stream",
             "extract_content_from_merged": "/api/v1/extract-content-from-merged",
             "process_lectures": "/api/v1/process-lectures",
             "complete_pipeline": "/api/v1/process-complete-pipeline",
             "status": "/api/v1/status",
             "update_config": "/api/v1/update-config",
+            "uploads": "/api/v1/uploads",
+            "upload_chunk": "/api/v1/uploads/{upload_id}",
+            "finalize_upload": "/api/v1/uploads/{upload_id}/finalize",
             "temp_files": "/api/v1/temp-files",
             "get_temp_file": "/api/v1/temp-files/{filename}",
             "get_temp_file_content": "/api/v1/temp-files/{filename}/content",
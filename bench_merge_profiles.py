@@ -0,0 +1,69 @@
+"""
+Benchmark of the merged-PDF output profiles.
+
+Merges every PDF in a folder once, then saves the result with each
+MERGE_OUTPUT_PROFILE and reports save time, output size and reopen time, so
+the trade-off can be picked per deployment. Run from the project root:
+
+    python bench_merge_profiles.py [slides_folder] [repeat]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import fitz
+
+# Add the backend app to the path
+backend_path = Path(__file__).parent / "backend"
+sys.path.append(str(backend_path))
+
+from app.services.pdf_merger import MERGE_OUTPUT_PROFILES, assemble_merged_pdf, validate_pdf
+
+def best_of(func, repeat):
+    """Return the fastest of several runs in seconds, and the last result"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    slides_folder = Path(sys.argv[1] if len(sys.argv) > 1 else "slides")
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    
+    pdf_paths = sorted(slides_folder.glob("*.pdf"))
+    if not pdf_paths:
+        print(f"No PDFs found in '{slides_folder}'")
+        return
+    
+    validated = []
+    for pdf_path in pdf_paths:
+        content = pdf_path.read_bytes()
+        page_count, repaired = validate_pdf(content)
+        validated.append((pdf_path.name, repaired or content, page_count))
+    input_size = sum(len(content) for _, content, _ in validated)
+    
+    merged_doc, toc, page_count = assemble_merged_pdf(validated)
+    print(f"Files: {len(validated)}, pages: {page_count}, input: {input_size / 1024 / 1024:.1f} MB")
+    print(f"   {'Profile':<10} {'Save (ms)':>10} {'Size (MB)':>10} {'vs input':>9} {'Reopen (ms)':>12}")
+    
+    try:
+        for profile, options in MERGE_OUTPUT_PROFILES.items():
+            save_time, pdf_bytes = best_of(lambda: merged_doc.tobytes(**options), repeat)
+            
+            def reopen():
+                with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+                    for page in doc:
+                        page.get_text()
+            reopen_time, _ = best_of(reopen, repeat)
+            
+            print(f"   {profile:<10} {save_time * 1000:10.1f} {len(pdf_bytes) / 1024 / 1024:10.2f} "
+                  f"{len(pdf_bytes) / input_size:8.0%} {reopen_time * 1000:12.1f}")
+    finally:
+        merged_doc.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Microbenchmark for the text normalization used by content extraction.
+
+Compares the fused normalizer against the previous per-line regex / per-character
+replace implementation on a synthetic slide deck. Run from the project root:
+
+    python bench_text_normalizer.py [pages]
+"""
+
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add the backend app to the path
+backend_path = Path(__file__).parent / "backend"
+sys.path.append(str(backend_path))
+
+from app.services.text_normalizer import extract_clean_paragraphs, join_cleaned_pages, replace_unicode
+
+PAGES_PER_CHAPTER = 30
+
+def legacy_extract_clean_paragraphs(text):
+    """Previous implementation: three passes and one regex call per line"""
+    def filter_lines_with_three_letters(text_block):
+        lines = text_block.splitlines()
+        return "\n".join(line for line in lines if re.search(r'[A-Za-z]{3}', line))
+    
+    filtered_text = filter_lines_with_three_letters(text)
+    cleaned_lines = []
+    for line in filtered_text.split('\n'):
+        stripped = line.strip()
+        if re.match(r'^\s*\d+\s*$', stripped):
+            continue
+        if not stripped or len(stripped) < 3:
+            continue
+        cleaned_lines.append(stripped)
+    
+    paragraph_text = ' '.join(cleaned_lines)
+    paragraph_text = re.sub(r'\s+', ' ', paragraph_text)
+    return paragraph_text.strip()
+
+LEGACY_REPLACEMENTS = {
+    '‘': "'", '’': "'", '‚': "'", '‛': "'",
+    '—': '-', '–': '-', '−': '-',
+    '…': '...',
+    '\u202f': ' ', '\xa0': ' ',
+    '′': "'",
+    '‹': '<', '›': '>',
+}
+
+def legacy_replace_unicode(text):
+    """Previous implementation: one str.replace per mapped character"""
+    for uni_char, ascii_char in LEGACY_REPLACEMENTS.items():
+        text = text.replace(uni_char, ascii_char)
+    return text
+
+def make_deck(page_count, seed=0):
+    """Create slide-like page texts with bullets, page numbers and short lines"""
+    rng = random.Random(seed)
+    words = ["data", "model", "training", "Gradient", "loss", "layer", "neural",
+             "network", "feature", "value", "ML", "x", "’s", "—", "…", "the", "of"]
+    pages = []
+    for page_num in range(1, page_count + 1):
+        lines = [f"Slide title {page_num}"]
+        for _ in range(rng.randint(8, 20)):
+            lines.append("  - " + " ".join(rng.choice(words) for _ in range(rng.randint(2, 14))))
+        lines += ["", "OK", str(page_num), "CS101 Machine Learning"]
+        pages.append("\n".join(lines) + "\n")
+    return pages
+
+def legacy_pipeline(pages):
+    """Clean every page, then re-clean each concatenated chapter"""
+    chapters = []
+    for start in range(0, len(pages), PAGES_PER_CHAPTER):
+        chapter_text = ""
+        for page_text in pages[start:start + PAGES_PER_CHAPTER]:
+            legacy_extract_clean_paragraphs(page_text)
+            chapter_text += page_text
+        chapters.append(legacy_replace_unicode(legacy_extract_clean_paragraphs(chapter_text)))
+    return chapters
+
+def fused_pipeline(pages):
+    """Clean every page once and assemble chapters from the cached results"""
+    chapters = []
+    for start in range(0, len(pages), PAGES_PER_CHAPTER):
+        chapter_pages = [(page_text, extract_clean_paragraphs(page_text))
+                         for page_text in pages[start:start + PAGES_PER_CHAPTER]]
+        chapters.append(replace_unicode(join_cleaned_pages(chapter_pages)))
+    return chapters
+
+def best_of(func, pages, repeat=5):
+    """Return the fastest of several runs in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(pages)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    pages = make_deck(page_count)
+    
+    assert legacy_pipeline(pages) == fused_pipeline(pages), "Outputs differ"
+    
+    legacy = best_of(legacy_pipeline, pages)
+    fused = best_of(fused_pipeline, pages)
+    
+    print(f"Pages: {page_count} ({sum(map(len, pages)) / 1024:.0f} KiB of text)")
+    print(f"   Legacy normalization: {legacy * 1000:8.1f} ms")
+    print(f"   Fused normalization:  {fused * 1000:8.1f} ms")
+    print(f"   Speedup:              {legacy / fused:8.1f}x")
+
+if __name__ == "__main__":
+    main()
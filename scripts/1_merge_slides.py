@@ -2,14 +2,10 @@ import os
 import fitz
 import re
 
-def strip_bookmarks(pdf_path):
-    """Open a PDF, remove bookmarks by creating a new doc with all pages."""
+def open_source(pdf_path):
+    """Open a PDF to merge; insert_pdf leaves its bookmarks behind, so no copy is needed."""
     try:
-        original = fitz.open(pdf_path)
-        cleaned = fitz.open()
-        cleaned.insert_pdf(original)
-        original.close()
-        return cleaned
+        return fitz.open(pdf_path)
     except Exception as e:
         print(f"Failed to process '{pdf_path}': {e}")
         return None
@@ -35,14 +31,19 @@ def main():
     toc = []
     page_counter = 0
 
+    # Each file is opened once: the document that is checked is the one inserted
     for pdf_file in pdf_files:
         pdf_path = os.path.join(slides_folder, pdf_file)
-        cleaned_doc = strip_bookmarks(pdf_path)
+        source_doc = open_source(pdf_path)
 
-        if cleaned_doc is None or cleaned_doc.page_count == 0:
+        if source_doc is None:
+            continue
+        page_count = source_doc.page_count
+        if page_count == 0:
+            source_doc.close()
             continue
 
-        merged_doc.insert_pdf(cleaned_doc)
+        merged_doc.insert_pdf(source_doc)
 
         # Remove leading zeros from the title
 
@@ -64,9 +65,9 @@ def main():
                 bookmark_title = number_part + rest
 
         toc.append([1, bookmark_title, page_counter + 1])
-        page_counter += cleaned_doc.page_count
+        page_counter += page_count
 
-        cleaned_doc.close()
+        source_doc.close()
 
     if page_counter == 0:
         print("No valid PDF content found to merge. Output not created.")
@@ -0,0 +1,145 @@
+"""
+Tests for chapter extraction from PDFs with a table of contents.
+"""
+
+import random
+import re
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+# Add the backend app to the path
+backend_path = Path(__file__).parent / "backend"
+sys.path.append(str(backend_path))
+
+from app.config import config
+from app.services.content_extractor import (
+    _key_xref, extract_all_toc_entries_with_content, iter_lectures_from_files, page_fingerprint
+)
+
+def _sample_deck(chapters=6, pages_per_chapter=3, seed=0) -> bytes:
+    """A bookmarked deck with a repeated footer, where chapter 4 repeats a slide of chapter 1"""
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(2000)]
+    slides = [[' '.join(rng.choice(vocabulary) for _ in range(60)) for _ in range(pages_per_chapter)]
+              for _ in range(chapters)]
+    slides[3][1] = slides[0][1]
+
+    doc = fitz.open()
+    toc = []
+    for chapter, chapter_slides in enumerate(slides):
+        toc.append([1, f"{chapter + 1}. Chapter {chapter + 1}", doc.page_count + 1])
+        for slide in chapter_slides:
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(50, 50, 550, 700), slide, fontsize=11)
+            page.insert_text((50, 800), "CS101 Introduction to Computing", fontsize=9)
+    doc.set_toc(toc)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+def _split_deck(pdf_bytes: bytes):
+    """One (filename, content, page count) file per chapter, as validate_pdfs returns them"""
+    deck = fitz.open(stream=pdf_bytes, filetype="pdf")
+    toc = deck.get_toc()
+    files = []
+    for i, (_, title, start_page) in enumerate(toc):
+        end_page = toc[i + 1][2] - 1 if i + 1 < len(toc) else deck.page_count
+        doc = fitz.open()
+        doc.insert_pdf(deck, from_page=start_page - 1, to_page=end_page - 1)
+        files.append((f"{i + 1:02d} Chapter {i + 1}.pdf", doc.tobytes(), doc.page_count))
+        doc.close()
+    deck.close()
+    return files
+
+def test_range_matches_full_extraction():
+    """A START/NUM_LECS range gives the same chapters as the same slice of a full extraction"""
+    print("Testing range extraction against a full extraction...")
+    saved = asdict(config)
+    config.PAGE_CACHE_MB = 0
+    config.STRIP_BOILERPLATE = True
+    config.DEDUP_THRESHOLD = 0.8
+    config.DEDUP_SCOPE = "deck"
+
+    try:
+        pdf_bytes = _sample_deck()
+        full = extract_all_toc_entries_with_content(pdf_bytes, workers=1)
+        assert [chapter["index"] for chapter in full] == [1, 2, 3, 4, 5, 6]
+        assert all("CS101" not in chapter["content"] for chapter in full), "Footer should be stripped"
+        assert not any(re.search(r"term\d+term", chapter["content"]) for chapter in full), \
+            "Words either side of a page break should stay separate"
+
+        for index_range in [(3, 5), (4, 5), (1, 7), (6, 9)]:
+            selected = extract_all_toc_entries_with_content(pdf_bytes, workers=1, index_range=index_range)
+            expected = [chapter for chapter in full if index_range[0] <= chapter["index"] < index_range[1]]
+            assert selected == expected, f"Range {index_range} differs from the full extraction"
+
+        # The slide repeated from chapter 1 is dropped even when chapter 1 is not extracted
+        chapter_4, = extract_all_toc_entries_with_content(pdf_bytes, workers=1, index_range=(4, 5))
+        assert len(chapter_4["content"]) < len(full[2]["content"]) * 0.8
+
+        # Low-memory extraction spills page text to disk but gives the same chapters
+        config.LOW_MEMORY = True
+        assert extract_all_toc_entries_with_content(pdf_bytes, workers=1) == full
+        assert extract_all_toc_entries_with_content(pdf_bytes, workers=1, index_range=(3, 5)) == full[2:4]
+    finally:
+        for field, value in saved.items():
+            setattr(config, field, value)
+    print("Range extraction verified")
+
+def test_direct_matches_merged_extraction():
+    """Extracting each file as a lecture gives the chapters of the merged deck, for any range"""
+    print("Testing direct extraction against the merged deck...")
+    saved = asdict(config)
+    config.PAGE_CACHE_MB = 0
+    config.STRIP_BOILERPLATE = True
+    config.DEDUP_THRESHOLD = 0.8
+    config.DEDUP_SCOPE = "deck"
+
+    try:
+        pdf_bytes = _sample_deck()
+        files = _split_deck(pdf_bytes)
+        merged = [{"index": chapter["index"], "title": chapter["title"], "content": chapter["content"]}
+                  for chapter in extract_all_toc_entries_with_content(pdf_bytes, workers=1)]
+        assert list(iter_lectures_from_files(files, workers=1)) == merged
+
+        for low_memory in (False, True):
+            config.LOW_MEMORY = low_memory
+            for index_range in [(3, 5), (4, 5), (6, 9)]:
+                selected = list(iter_lectures_from_files(files, index_range, workers=1))
+                expected = [lecture for lecture in merged if index_range[0] <= lecture["index"] < index_range[1]]
+                assert selected == expected, f"Range {index_range} differs from the merged deck"
+    finally:
+        for field, value in saved.items():
+            setattr(config, field, value)
+    print("Direct extraction verified")
+
+def test_page_fingerprint_covers_fonts():
+    """A slide keeps its key when merged, but not when its font's text mapping changes"""
+    print("Testing page fingerprints...")
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_font(fontname="F0", fontbuffer=fitz.Font("cjk").buffer)
+    page.insert_text((72, 72), "Binary trees", fontname="F0")
+    deck = fitz.open(stream=doc.tobytes())
+    key = page_fingerprint(deck, 1)
+
+    merged = fitz.open()
+    merged.new_page().insert_text((72, 72), "Title slide")
+    merged.insert_pdf(deck)
+    assert page_fingerprint(merged, 2) == key, "Document-specific xrefs should not change the key"
+
+    font_xref = deck[0].get_fonts()[0][0]
+    to_unicode = _key_xref(deck, font_xref, "ToUnicode")
+    assert to_unicode, "The embedded font should have a ToUnicode map"
+    deck.update_stream(to_unicode, deck.xref_stream(to_unicode).replace(b"endcmap", b"%\nendcmap"))
+    assert page_fingerprint(deck, 1) != key, "A changed ToUnicode map should change the key"
+    print("Page fingerprints verified")
+
+if __name__ == "__main__":
+    test_range_matches_full_extraction()
+    test_direct_matches_merged_extraction()
+    test_page_fingerprint_covers_fonts()
+    print("\nAll content extractor tests passed!")
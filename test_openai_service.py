@@ -0,0 +1,98 @@
+"""
+Tests for the prompts the OpenAI service sends for each lecture.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+from openai import APIConnectionError, InternalServerError
+
+# Add the backend app to the path
+backend_path = Path(__file__).parent / "backend"
+sys.path.append(str(backend_path))
+
+from app.config import config, system_prompt, user_prompt_2, user_prompt_3, user_prompt_4, user_prompt_5
+from app.services import openai_service
+from app.services.openai_service import TRANSIENT_RETRIES, OpenAIService, lecture_messages
+
+def test_lecture_messages_share_prefix():
+    """Every follow-up call starts with the system prompt, lecture and study notes"""
+    print("Testing lecture message prefixes...")
+    lec_prompt_1 = "Lecture 1\n\nSome lecture text"
+    study_notes = "# Study notes"
+
+    first = lecture_messages(lec_prompt_1)
+    assert first == [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": lec_prompt_1},
+    ]
+
+    prefix = first + [{"role": "assistant", "content": study_notes}]
+    follow_ups = [
+        lecture_messages(lec_prompt_1, study_notes, user_prompt_2),
+        lecture_messages(lec_prompt_1, study_notes, user_prompt_3),
+        lecture_messages(lec_prompt_1, study_notes, user_prompt_3, "Questions", user_prompt_4),
+        lecture_messages(lec_prompt_1, study_notes, user_prompt_5),
+    ]
+    for messages in follow_ups:
+        assert messages[:len(prefix)] == prefix, "Follow-ups should share the lecture prefix"
+        assert messages[len(prefix)]["role"] == "user"
+
+    # The answers call continues the questions call, so it shares that prefix too
+    questions, answers = follow_ups[1], follow_ups[2]
+    assert answers[:len(questions)] == questions
+    assert [message["role"] for message in answers[len(prefix):]] == ["user", "assistant", "user"]
+    print("Lecture message prefixes verified")
+
+def test_transient_errors_are_retried():
+    """Connection errors and 5xx responses are retried a few times, then reported"""
+    print("Testing transient error retries...")
+    # Only the attributes the exceptions read from the HTTP request/response
+    request = SimpleNamespace(method="POST", url="https://api.openai.com/v1/chat/completions")
+    response = SimpleNamespace(request=request, status_code=500, headers={})
+    errors = [
+        APIConnectionError(request=request),
+        InternalServerError("Server error", response=response, body=None),
+    ]
+    completion = SimpleNamespace(
+        usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content="Notes"))]
+    )
+
+    def fake_create(failures):
+        attempts = []
+        async def create(**kwargs):
+            attempts.append(kwargs)
+            if len(attempts) <= failures:
+                raise errors[(len(attempts) - 1) % len(errors)]
+            return completion
+        return create, attempts
+
+    saved = config.LLM_CACHE_MB, openai_service.backoff_delay
+    config.LLM_CACHE_MB = 0
+    openai_service.backoff_delay = lambda attempt, hint=None: 0
+    try:
+        service = OpenAIService(api_key="test")
+        service.client.chat.completions.create, attempts = fake_create(TRANSIENT_RETRIES)
+        content, _ = asyncio.run(service.generate([{"role": "user", "content": "Hi"}], model="gpt-4o-mini"))
+        assert content == "Notes"
+        assert len(attempts) == TRANSIENT_RETRIES + 1
+
+        service.client.chat.completions.create, attempts = fake_create(TRANSIENT_RETRIES + 1)
+        try:
+            asyncio.run(service.generate([{"role": "user", "content": "Hi"}], model="gpt-4o-mini"))
+        except HTTPException as e:
+            assert e.status_code == 500
+        else:
+            raise AssertionError("Errors past the retry budget should be reported")
+        assert len(attempts) == TRANSIENT_RETRIES + 1
+    finally:
+        config.LLM_CACHE_MB, openai_service.backoff_delay = saved
+    print("Transient error retries verified")
+
+if __name__ == "__main__":
+    test_lecture_messages_share_prefix()
+    test_transient_errors_are_retried()
+    print("\nAll OpenAI service tests passed!")
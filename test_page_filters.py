@@ -0,0 +1,132 @@
+"""
+Tests for the page filters applied before chapter assembly.
+"""
+
+import random
+import sys
+from pathlib import Path
+
+# Add the backend app to the path
+backend_path = Path(__file__).parent / "backend"
+sys.path.append(str(backend_path))
+
+from app.services.page_filters import BoilerplateIndex, NearDuplicateIndex, collapse_builds, jaccard, shingles
+from app.services.text_normalizer import extract_clean_paragraphs, join_cleaned_pages
+
+def _random_pages(count, words_per_page=80, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(3000)]
+    return [' '.join(rng.choice(vocabulary) for _ in range(words_per_page)) for _ in range(count)]
+
+def test_boilerplate_index():
+    """Lines repeated across most pages are stripped, page counters included"""
+    print("Testing BoilerplateIndex...")
+    
+    pages = [
+        f"CS101 Machine Learning\nTopic {i}: {topic}\nDr. Smith\n(c) 2024 University\nSlide {i} of 6"
+        for i, topic in enumerate(["Intro", "Regression", "Trees", "Ensembles", "Clustering", "Review"], 1)
+    ]
+    index = BoilerplateIndex(0.5)
+    index.add_pages(pages)
+    
+    assert index.strip(pages[1]) == "Topic 2: Regression\n"
+    assert index.strip("An unrelated slide") == "An unrelated slide"
+    
+    # Short decks are left alone
+    short = BoilerplateIndex(0.5)
+    short.add_pages(pages[:3])
+    assert short.strip(pages[0]) == pages[0]
+    print("BoilerplateIndex verified")
+
+def test_boilerplate_keeps_page_breaks():
+    """Words either side of a page boundary stay separate once footers are stripped"""
+    print("Testing page breaks after stripping...")
+    topics = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta"]
+    pages = [f"Slide on {topic} ends with {topic}\nCS101 Introduction to Computing\n" for topic in topics]
+    index = BoilerplateIndex(0.5)
+    index.add_pages(pages)
+
+    stripped = [index.strip(page) for page in pages]
+    assert all(page.endswith("\n") and "CS101" not in page for page in stripped)
+    joined = join_cleaned_pages([(page, extract_clean_paragraphs(page)) for page in stripped])
+    assert "with alpha Slide on beta" in joined, f"Pages should not fuse: {joined!r}"
+    assert "alphaSlide" not in joined
+    print("Page breaks verified")
+
+def test_collapse_builds():
+    """Only the final page of each build-up sequence is kept"""
+    print("Testing collapse_builds...")
+    
+    pages = [
+        "Agenda - Data Cleaning",
+        "Agenda - Data Cleaning - Feature Engineering",
+        "Agenda - Data Cleaning - Feature Engineering - Modelling",
+        "Summary of cleaning",
+        "Summary of feature engineering",
+        "",
+        "Questions",
+    ]
+    assert collapse_builds(pages) == [2, 3, 4, 5, 6]
+    
+    # Line breaks and spacing differences do not matter
+    assert collapse_builds(["Title\n- first", "Title  - first\n- second"]) == [1]
+    print("collapse_builds verified")
+
+def test_collapse_builds_keeps_unrelated_pages():
+    """Pages whose words merely reappear in order on the next page are kept"""
+    print("Testing collapse_builds on unrelated pages...")
+    
+    pages = [
+        "Neural Networks Overview",
+        "Neural networks are layered models. Networks are trained by gradient descent. Overview of training",
+        "Trees",
+        "Treesitter parses code",
+    ]
+    assert collapse_builds(pages) == [0, 1, 2, 3]
+    
+    # Scattered words are not a build, even when all of them appear in order
+    assert collapse_builds(["Title first last", "Title first middle last"]) == [0, 1]
+    print("Unrelated pages verified")
+
+def test_near_duplicate_index():
+    """Near-duplicates anywhere in the index are caught; distinct pages are kept"""
+    print("Testing NearDuplicateIndex...")
+    
+    pages = _random_pages(300)
+    index = NearDuplicateIndex(0.8)
+    assert all(index.add_if_new(page) for page in pages), "Distinct pages were dropped"
+    
+    rng = random.Random(1)
+    for page in pages[::10]:
+        words = page.split()
+        words[rng.randrange(len(words))] = "edited"
+        edited = ' '.join(words)
+        assert jaccard(shingles(page), shingles(edited)) >= 0.8
+        assert not index.add_if_new(edited), "Near-duplicate page was kept"
+    
+    # Empty pages are never treated as duplicates
+    assert index.add_if_new("") and index.add_if_new("")
+    print("NearDuplicateIndex verified")
+
+def test_near_duplicate_threshold():
+    """Pages below the threshold are kept even when they share text"""
+    print("Testing NearDuplicateIndex threshold...")
+    
+    base = _random_pages(1, 60, seed=2)[0]
+    extended = base + ' ' + _random_pages(1, 60, seed=3)[0]
+    similarity = jaccard(shingles(base), shingles(extended))
+    
+    loose = NearDuplicateIndex(similarity - 0.05)
+    assert loose.add_if_new(base) and not loose.add_if_new(extended)
+    strict = NearDuplicateIndex(similarity + 0.05)
+    assert strict.add_if_new(base) and strict.add_if_new(extended)
+    print("NearDuplicateIndex threshold verified")
+
+if __name__ == "__main__":
+    test_boilerplate_index()
+    test_boilerplate_keeps_page_breaks()
+    test_collapse_builds()
+    test_collapse_builds_keeps_unrelated_pages()
+    test_near_duplicate_index()
+    test_near_duplicate_threshold()
+    print("\nAll page filter tests passed!")
@@ -0,0 +1,109 @@
+"""
+Tests for the client-side OpenAI rate limiter and its retry delays.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add the backend app to the path
+backend_path = Path(__file__).parent / "backend"
+sys.path.append(str(backend_path))
+
+from app.config import parse_model_limits
+from app.services.rate_limiter import TokenBucket, backoff_delay, parse_duration, retry_after
+
+def test_parse_duration():
+    """Reset headers in OpenAI's duration format and plain seconds"""
+    print("Testing duration parsing...")
+    assert parse_duration("20ms") == 0.02
+    assert parse_duration("1.5s") == 1.5
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("1h2m3s") == 3723
+    assert parse_duration("30") == 30
+    assert parse_duration(" 0.5 ") == 0.5
+    assert parse_duration("soon") is None
+    print("Duration parsing verified")
+
+def test_retry_after():
+    """Explicit retry-after wins, otherwise only an exhausted bucket's reset counts"""
+    print("Testing retry-after hints...")
+    assert retry_after(None) is None
+    assert retry_after({}) is None
+    assert retry_after({"retry-after-ms": "250", "retry-after": "3"}) == 0.25
+    assert retry_after({"retry-after": "3", "x-ratelimit-reset-tokens": "6m0s",
+                        "x-ratelimit-remaining-tokens": "0"}) == 3
+
+    # Requests are exhausted; the far-off token reset is irrelevant
+    headers = {
+        "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "120ms",
+        "x-ratelimit-remaining-tokens": "15000", "x-ratelimit-reset-tokens": "6m0s",
+    }
+    assert retry_after(headers) == 0.12
+    headers["x-ratelimit-remaining-tokens"] = "0"
+    assert retry_after(headers) == 360
+    # Neither bucket is exhausted: no hint, so the caller backs off exponentially
+    assert retry_after({"x-ratelimit-remaining-requests": "3", "x-ratelimit-reset-requests": "1s"}) is None
+    print("Retry-after hints verified")
+
+def test_backoff_delay():
+    """Jitter stays within its bounds, with and without a server hint"""
+    print("Testing backoff jitter...")
+    for _ in range(200):
+        assert 0.5 <= backoff_delay(1) <= 1
+        assert 4 <= backoff_delay(4) <= 8
+        assert 30 <= backoff_delay(20) <= 60
+        assert 2 <= backoff_delay(3, hint=2) <= 2.6
+        assert 0.1 <= backoff_delay(3, hint=0.1) <= 0.25
+    print("Backoff jitter verified")
+
+def test_token_bucket():
+    """Buckets refill continuously up to capacity and take refunds"""
+    print("Testing token bucket...")
+    bucket = TokenBucket(600)
+    assert bucket.wait_time(600) == 0
+    bucket.take(600)
+    assert abs(bucket.wait_time(60) - 6) < 0.1, "600 per minute refills 60 units in 6 seconds"
+
+    # Refill is proportional to the elapsed time, capped at capacity
+    bucket.updated -= 3
+    bucket._refill(time.monotonic())
+    assert 29 <= bucket.level <= 31
+    bucket.updated -= 600
+    bucket._refill(time.monotonic())
+    assert bucket.level == 600
+
+    bucket.take(500)
+    bucket.give(200)
+    assert 299 <= bucket.level <= 301, "Refund should return unused units"
+    bucket.give(10000)
+    assert bucket.level == 600, "Refunds should not exceed capacity"
+
+    # A request larger than the budget waits for a full bucket, not forever
+    bucket.take(600)
+    assert bucket.wait_time(10 ** 6) <= 60
+    assert TokenBucket(0).wait_time(10 ** 6) == 0, "Capacity 0 means unlimited"
+    print("Token bucket verified")
+
+def test_parse_model_limits():
+    """Per-model limits parse, and malformed values are rejected"""
+    print("Testing model limits...")
+    assert parse_model_limits("") == {}
+    assert parse_model_limits("gpt-4o=500:30000, gpt-4o-mini=500:200000") == {
+        "gpt-4o": (500, 30000), "gpt-4o-mini": (500, 200000)
+    }
+    for value in ("gpt-4o=500", "gpt-4o", "=5:5", "gpt-4o=a:b", "gpt-4o=-1:5"):
+        try:
+            parse_model_limits(value)
+        except ValueError:
+            continue
+        raise AssertionError(f"{value!r} should be rejected")
+    print("Model limits verified")
+
+if __name__ == "__main__":
+    test_parse_duration()
+    test_retry_after()
+    test_backoff_delay()
+    test_token_bucket()
+    test_parse_model_limits()
+    print("\nAll rate limiter tests passed!")
@@ -4,6 +4,7 @@ Test script to verify the temp directory functionality is working correctly.
 
 import os
 import sys
+import time
 from pathlib import Path
 
 # Add the backend app to the path
@@ -15,6 +16,8 @@ from app.utils.temp_utils import (
     create_temp_file, 
     save_temp_file, 
     save_temp_json, 
+    save_temp_json_items,
+    iter_temp_json_items,
     save_temp_markdown,
     list_temp_files,
     cleanup_temp_files
@@ -77,12 +80,82 @@ This is a test lecture with some **bold** text and *italic* text.
         assert "Test Lecture" in loaded_md, "Markdown content should contain title"
     print("Markdown content verified")
     
-    # Test 8: Cleanup (optional - comment out to keep files for manual inspection)
+    # Test 8: Streamed JSON list matches save_temp_json
+    lectures = test_data["lectures"] * 3
+    streamed_path = save_temp_json_items(iter(lectures), 'test_lectures_streamed.json')
+    list_path = save_temp_json(lectures, 'test_lectures_list.json')
+    assert streamed_path.read_bytes() == list_path.read_bytes(), "Streamed JSON should match save_temp_json"
+    assert not (temp_dir / 'test_lectures_streamed.json.part').exists(), "Partial file should be replaced"
+    nested = [{"title": "A", "pages": [1, 2], "notes": {"text": "line\nbreak ]"}}, [], {}, "x"]
+    nested_path = save_temp_json_items(iter(nested), 'test_lectures_nested.json')
+    assert list(iter_temp_json_items(nested_path)) == nested, "Items should read back one at a time"
+    assert list(iter_temp_json_items(save_temp_json_items(iter([]), 'test_empty.json'))) == []
+    print("Streamed JSON verified")
+    
+    # Test 9: Cleanup (optional - comment out to keep files for manual inspection)
     # cleanup_count = cleanup_temp_files()
     # print(f"Cleaned up {cleanup_count} temp files")
     
     print("\nAll tests passed! Temp utilities are working correctly.")
     print(f"Temp files are located at: {temp_dir}")
 
+def test_sqlite_cache_ttl():
+    """Expired entries miss and are dropped on the next write"""
+    from app.utils.sqlite_cache import SqliteCache
+
+    path = get_temp_dir() / 'test_cache_ttl.sqlite3'
+    for leftover in path.parent.glob(path.name + '*'):
+        leftover.unlink()
+
+    cache = SqliteCache(path, 1024 * 1024, ttl=60)
+    cache.set('fresh', 'value')
+    assert cache.get('fresh') == 'value', "Fresh entry should hit"
+
+    cache.ttl = 0.01
+    time.sleep(0.05)
+    assert cache.get('fresh') is None, "Expired entry should miss"
+    cache.set('other', 'value')
+    assert SqliteCache(path, 1024 * 1024).get('fresh') is None, "Expired entry should be deleted"
+    assert cache.stats() == {"hits": 1, "misses": 1}
+    print("SQLite cache expiry verified")
+
+    for leftover in path.parent.glob(path.name + '*'):
+        leftover.unlink()
+
+def test_file_cache_pins():
+    """Pinned entries survive eviction until every pin is released"""
+    import shutil
+    from app.utils.file_cache import FileCache
+
+    path = get_temp_dir() / 'test_file_cache'
+    shutil.rmtree(path, ignore_errors=True)
+
+    def age(key, seconds_ago):
+        os.utime(path / f"{key}.bin", (time.time() - seconds_ago,) * 2)
+
+    # Room for two entries; the least recently used one goes first
+    cache = FileCache(path, 250)
+    cache.set('in_use', b'a' * 100, {}, pin=True)
+    assert cache.get('in_use', pin=True) is not None
+    cache.set('idle', b'b' * 100, {})
+    age('in_use', 20)
+    age('idle', 10)
+    cache.set('new', b'c' * 100, {})
+    assert cache.get('idle') is None, "Unpinned entry should be evicted instead"
+
+    cache.unpin('in_use')
+    age('in_use', 20)
+    cache.set('newer', b'd' * 100, {})
+    assert cache.get('new') is None, "Entry should stay pinned until the last unpin"
+    cache.unpin('in_use')
+    age('in_use', 20)
+    cache.set('newest', b'e' * 100, {})
+    assert cache.get('in_use') is None, "Released entry should be evictable again"
+    print("File cache pins verified")
+
+    shutil.rmtree(path, ignore_errors=True)
+
 if __name__ == "__main__":
     test_temp_utils()
+    test_sqlite_cache_ttl()
+    test_file_cache_pins()
@@ -0,0 +1,150 @@
+"""
+Golden-output tests for the text normalization used by content extraction.
+"""
+
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add the backend app to the path
+backend_path = Path(__file__).parent / "backend"
+sys.path.append(str(backend_path))
+
+from app.services.text_normalizer import (
+    extract_clean_paragraphs,
+    find_capital_blocks,
+    insert_periods_after_titles,
+    join_cleaned_pages,
+    normalize_text,
+    remove_capital
+)
+
+# Pattern find_capital_blocks replaces; only safe to run on short inputs
+CAPITAL_BLOCK_PATTERN = re.compile(r"\b(?:(?:[A-Z]|[^\w\s.])+\s?)+\b")
+
+# Inputs that make CAPITAL_BLOCK_PATTERN backtrack exponentially
+ADVERSARIAL_UNITS = [
+    ("a", "-", " "),
+    ("", "A", "__"),
+    ("x", "A-", " y"),
+    ("", "(-) ", "x"),
+    ("", "AB ", "a"),
+    ("", "# ", ""),
+]
+
+SLIDE_TEXT = (
+    "Lecture 3: Data Preprocessing\n\n  12  \n"
+    "Learn how to clean and prepare data\tfor models.\nOK\n"
+    "- Data Cleaning\n- Feature   Engineering\n"
+)
+
+def test_extract_clean_paragraphs():
+    """Short lines and page numbers are dropped, whitespace is collapsed"""
+    print("Testing extract_clean_paragraphs...")
+    
+    assert extract_clean_paragraphs(SLIDE_TEXT) == (
+        "Lecture 3: Data Preprocessing Learn how to clean and prepare data for models. "
+        "- Data Cleaning - Feature Engineering"
+    )
+    assert extract_clean_paragraphs("") == ""
+    assert extract_clean_paragraphs("12\n\nab\n") == ""
+    assert extract_clean_paragraphs("One Two lines\r\nthree\x0cfour") == "One Two lines three four"
+    print("extract_clean_paragraphs verified")
+
+def test_normalize_text():
+    """Unicode punctuation becomes ASCII and capital blocks get terminated"""
+    print("Testing normalize_text...")
+    
+    assert normalize_text(
+        "Students’ results — mean ‘score’ … range 3−5 units ‹ok›"
+    ) == "Students' results - mean 'score' ... range 3-5 units <ok>"
+    assert normalize_text("non\xa0breaking space") == "non breaking space"
+    assert normalize_text("End of part. . Next part") == "End of part. Next part"
+    assert normalize_text(
+        "INTRODUCTION TO MACHINE LEARNING Supervised methods use LABELLED DATA here. NASA is short."
+    ) == "INTRODUCTION TO MACHINE LEARNING. Supervised methods use LABELLED DATA. here. NASA is short."
+    print("normalize_text verified")
+
+def test_join_cleaned_pages():
+    """Joining cached page texts matches cleaning the concatenated pages"""
+    print("Testing join_cleaned_pages...")
+    
+    raw_pages = [
+        SLIDE_TEXT,
+        "Second page heading\nwith a trailing line",
+        "",
+        "Third page\r",
+        "  no trailing break here",
+        "Last page text",
+    ]
+    pages = [(raw, extract_clean_paragraphs(raw)) for raw in raw_pages]
+    
+    for count in range(1, len(pages) + 1):
+        expected = extract_clean_paragraphs("".join(raw_pages[:count]))
+        assert join_cleaned_pages(pages[:count]) == expected, f"Mismatch for first {count} pages"
+    print("join_cleaned_pages verified")
+
+def test_insert_periods_after_titles():
+    """Every title gets a period after its first letter-wise match"""
+    print("Testing insert_periods_after_titles...")
+    
+    content = "Lecture 2 Neural Networks Neurons and Layers: activation functions. Back-propagation works"
+    titles = ["2. Neural Networks", "Neurons and layers", "Activation functions", "Backpropagation", "Missing"]
+    assert insert_periods_after_titles(titles, content) == (
+        "Lecture 2 Neural Networks. Neurons and Layers.: activation functions. Back-propagation. works"
+    )
+    
+    # Overlapping prefixes are not skipped: "aab" starts one letter into "aaab"
+    assert insert_periods_after_titles(["aab"], "aaab x") == "aaab. x"
+    
+    # Titles ending at the same place only add one period; letterless titles are ignored
+    assert insert_periods_after_titles(["Part One", "one", "1.2"], "PART ONE text") == "PART ONE. text"
+    print("insert_periods_after_titles verified")
+
+def test_find_capital_blocks_matches_pattern():
+    """The linear scan yields exactly the spans of the original pattern"""
+    print("Testing find_capital_blocks against the regex...")
+    
+    samples = [
+        "INTRODUCTION TO MACHINE LEARNING Supervised methods",
+        "Use R&D (C) and A-B-C -> OUTPUT_X == DONE.",
+        "aB-CD e-FGH ==> ijk É ÉCOLE __INIT__ A. B. C",
+        "x -- y ## Z\tQQ\nRR  SS a",
+    ]
+    samples += [prefix + unit * 6 + suffix for prefix, unit, suffix in ADVERSARIAL_UNITS]
+    
+    for text in samples:
+        expected = [match.span() for match in CAPITAL_BLOCK_PATTERN.finditer(text)]
+        assert list(find_capital_blocks(text)) == expected, f"Span mismatch for {text!r}"
+    
+    assert remove_capital("Use R&D (C) and A-B-C -> OUTPUT_X == DONE.") == (
+        "Use R&D (C) and A-B-C -> OUTPUT_X == DONE."
+    )
+    assert remove_capital("THE DATA LAYER design") == "THE DATA LAYER. design"
+    print("find_capital_blocks verified")
+
+def test_remove_capital_adversarial_time():
+    """Runs of capitals and symbols are processed in bounded time per character"""
+    print("Testing remove_capital on adversarial input...")
+    
+    for prefix, unit, suffix in ADVERSARIAL_UNITS:
+        count = 100000 // len(unit)
+        text = prefix + unit * count + suffix
+        start = time.perf_counter()
+        remove_capital(text)
+        elapsed = time.perf_counter() - start
+        
+        # Generous bound: about 2 microseconds per character
+        assert elapsed < 2e-6 * len(text) + 0.05, f"{unit!r} run took {elapsed:.2f}s"
+        print(f"   {unit!r} x {count}: {elapsed * 1000:.1f} ms")
+    print("Adversarial timing verified")
+
+if __name__ == "__main__":
+    test_extract_clean_paragraphs()
+    test_normalize_text()
+    test_join_cleaned_pages()
+    test_insert_periods_after_titles()
+    test_find_capital_blocks_matches_pattern()
+    test_remove_capital_adversarial_time()
+    print("\nAll text normalizer tests passed!")